@@ -53,6 +53,7 @@ async def setup_bot_commands(bot: Bot):
         BotCommand(command="users", description="Foydalanuvchilar"),
         BotCommand(command="broadcast", description="Xabar yuborish"),
         BotCommand(command="backup", description="Ma'lumotlar zaxirasi"),
+        BotCommand(command="metrics", description="Konversiya vaqtlari"),
     ]
     
     try:
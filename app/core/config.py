@@ -1,5 +1,5 @@
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +17,16 @@ class Config:
     # Ma'lumotlar bazasi
     DATABASE_URL: str = os.getenv("DATABASE_URL", "data/bot.db")
     DATABASE_BACKUP_INTERVAL: int = int(os.getenv("DATABASE_BACKUP_INTERVAL", "3600"))
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "4"))
+    DATABASE_JOURNAL_MODE: str = os.getenv("DATABASE_JOURNAL_MODE", "WAL")
+    DATABASE_SYNCHRONOUS: str = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL")
+    DATABASE_MMAP_SIZE: int = int(os.getenv("DATABASE_MMAP_SIZE", "268435456"))  # 256MB
+    DATABASE_BUSY_TIMEOUT: int = int(os.getenv("DATABASE_BUSY_TIMEOUT", "5000"))  # ms
+    WRITE_BEHIND_INTERVAL: float = float(os.getenv("WRITE_BEHIND_INTERVAL", "0.5"))  # soniya
+    WRITE_BEHIND_MAX_ROWS: int = int(os.getenv("WRITE_BEHIND_MAX_ROWS", "1000"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "300"))  # soniya
+    USER_ACTIVITY_GRANULARITY: int = int(os.getenv("USER_ACTIVITY_GRANULARITY", "60"))  # soniya
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -26,16 +36,46 @@ class Config:
     
     # Audio processing
     MAX_AUDIO_SIZE: int = int(os.getenv("MAX_AUDIO_SIZE", "52428800"))  # 50MB
-    SUPPORTED_AUDIO_FORMATS: List[str] = os.getenv("SUPPORTED_AUDIO_FORMATS", "mp3,wav,ogg,m4a,flac,aac").split(",")
+    SUPPORTED_AUDIO_FORMATS: List[str] = os.getenv("SUPPORTED_AUDIO_FORMATS", "mp3,wav,ogg,m4a,flac,aac,webm").split(",")
     TEMP_AUDIO_DIR: str = os.getenv("TEMP_AUDIO_DIR", "data/temp")
+    AUDIO_PIPE_MODE: bool = os.getenv("AUDIO_PIPE_MODE", "true").lower() == "true"
+    AUDIO_OPUS_STEREO_COPY: bool = os.getenv("AUDIO_OPUS_STEREO_COPY", "false").lower() == "true"
+    AUDIO_CHUNKED_MIN_DURATION: int = int(os.getenv("AUDIO_CHUNKED_MIN_DURATION", "1800"))  # soniya, 0 = o'chirilgan
+    AUDIO_CHUNK_SECONDS: int = int(os.getenv("AUDIO_CHUNK_SECONDS", "600"))
+    AUDIO_CHUNK_PARALLELISM: int = int(os.getenv("AUDIO_CHUNK_PARALLELISM", "0"))  # 0 = bo'sh ishchilar soni
+    PROBE_CACHE_SIZE: int = int(os.getenv("PROBE_CACHE_SIZE", "10000"))
+    PROBE_CACHE_TTL: int = int(os.getenv("PROBE_CACHE_TTL", "86400"))  # soniya
+    AUDIO_DEFAULT_PROFILE: str = os.getenv("AUDIO_DEFAULT_PROFILE", "music")  # music, speech, speech_low
+    AUDIO_LONG_DURATION: int = int(os.getenv("AUDIO_LONG_DURATION", "600"))  # soniya
+    AUDIO_HIGH_LOAD_RATIO: float = float(os.getenv("AUDIO_HIGH_LOAD_RATIO", "1.0"))  # navbat / ishchilar
+    AUDIO_TARGET_OUTPUT_SIZE: int = int(os.getenv("AUDIO_TARGET_OUTPUT_SIZE", "20971520"))  # 20MB, 0 = cheklovsiz
+    AUDIO_CACHE_MAX_BYTES: int = int(os.getenv("AUDIO_CACHE_MAX_BYTES", "536870912"))  # 512MB, 0 = o'chirilgan
+    CONVERSION_CACHE_SIZE: int = int(os.getenv("CONVERSION_CACHE_SIZE", "50000"))
+    CONVERSION_WORKERS: int = int(os.getenv("CONVERSION_WORKERS", "0"))  # 0 = CPU yadrolari soni
+    CONVERSION_QUEUE_SIZE: int = int(os.getenv("CONVERSION_QUEUE_SIZE", "50"))
     
     # Rate limiting
     RATE_LIMIT_MESSAGES: int = int(os.getenv("RATE_LIMIT_MESSAGES", "10"))
     RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | sqlite
+    
+    # Broadcast (Telegram: ~30 xabar/soniya umumiy, 1 xabar/soniya bitta chatga)
+    BROADCAST_RATE: float = float(os.getenv("BROADCAST_RATE", "25"))  # xabar/soniya
+    BROADCAST_BURST: float = float(os.getenv("BROADCAST_BURST", "5"))
+    BROADCAST_CONCURRENCY: int = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+    BROADCAST_MAX_RETRIES: int = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+    BROADCAST_MAX_FLOOD_WAITS: int = int(os.getenv("BROADCAST_MAX_FLOOD_WAITS", "10"))  # bitta oluvchi uchun
+    BROADCAST_CHECKPOINT_INTERVAL: float = float(os.getenv("BROADCAST_CHECKPOINT_INTERVAL", "2"))  # soniya
+    BROADCAST_PROGRESS_INTERVAL: float = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "3"))  # soniya
     
     # Majburiy obuna
     FORCE_SUB_ENABLED: bool = os.getenv("FORCE_SUB_ENABLED", "true").lower() == "true"
     MIN_ADMIN_APPROVE_TIME: int = int(os.getenv("MIN_ADMIN_APPROVE_TIME", "300"))  # 5 daqiqa
+    FORCE_SUB_CHECK_CONCURRENCY: int = int(os.getenv("FORCE_SUB_CHECK_CONCURRENCY", "5"))
+    FORCE_SUB_CHECK_TIMEOUT: float = float(os.getenv("FORCE_SUB_CHECK_TIMEOUT", "3"))  # soniya
+    FORCE_SUB_CACHE_SIZE: int = int(os.getenv("FORCE_SUB_CACHE_SIZE", "50000"))
+    FORCE_SUB_MEMBER_TTL: int = int(os.getenv("FORCE_SUB_MEMBER_TTL", "600"))  # soniya
+    FORCE_SUB_LEFT_TTL: int = int(os.getenv("FORCE_SUB_LEFT_TTL", "30"))  # soniya
     
     # Webhook (ixtiyoriy)
     WEBHOOK_ENABLED: bool = os.getenv("WEBHOOK_ENABLED", "false").lower() == "true"
@@ -43,6 +83,10 @@ class Config:
     WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
     WEBAPP_HOST: str = os.getenv("WEBAPP_HOST", "localhost")
     WEBAPP_PORT: int = int(os.getenv("WEBAPP_PORT", "8080"))
+    # Metrikalar faqat alohida HTTP serverda beriladi (port 0 = o'chirilgan)
+    METRICS_PATH: str = os.getenv("METRICS_PATH", "/metrics")
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
     
     # Debug
     DEBUG_MODE: bool = os.getenv("DEBUG_MODE", "false").lower() == "true"
@@ -70,6 +114,16 @@ class Config:
             
         return True
 
+    @classmethod
+    def database_pragmas(cls) -> Dict[str, Any]:
+        """SQLite PRAGMA sozlamalari"""
+        return {
+            'journal_mode': cls.DATABASE_JOURNAL_MODE,
+            'synchronous': cls.DATABASE_SYNCHRONOUS,
+            'mmap_size': cls.DATABASE_MMAP_SIZE,
+            'busy_timeout': cls.DATABASE_BUSY_TIMEOUT,
+        }
+
     @classmethod
     def create_directories(cls):
         """Kerakli kataloglarni yaratish"""
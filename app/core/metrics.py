@@ -0,0 +1,330 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Soniyalar uchun standart bucket chegaralari (Telegram I/O va ffmpeg oralig'i)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120, 300)
+
+# Middleware va DB so'rovlari uchun mayda bucket'lar
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """
+    Bucket'li gistogramma
+
+    Kuzatuvlarning o'zi saqlanmaydi - faqat bucket hisoblagichlari, shuning
+    uchun xotira doimiy. Kvantillar bucket ichida chiziqli interpolyatsiya
+    bilan taxmin qilinadi (Prometheus ``histogram_quantile`` kabi).
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # Oxirgi element - +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Taxminiy kvantil (kuzatuv bo'lmasa None)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, n in zip(self.buckets, self.counts):
+            if n and cumulative + n >= rank:
+                return min(lower + (upper - lower) * (rank - cumulative) / n, self.max)
+            cumulative += n
+            lower = upper
+        # +Inf bucket'ida yuqori chegara yo'q - eng katta kuzatuv qaytariladi
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        result = {'count': self.count, 'sum': self.sum, 'max': self.max}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = self.quantile(q)
+        return result
+
+
+class MetricFamily:
+    """Bir nomli, label qiymatlari bo'yicha ajratilgan metrika"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Prometheus text formatidagi qatorlar"""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self._samples(),
+        ]
+
+
+class Counter(MetricFamily):
+    """Faqat o'sadigan hisoblagich"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._format_labels(key)} {value}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(MetricFamily):
+    """
+    Joriy qiymat
+
+    Qiymat ``set`` bilan yoziladi yoki ``set_function`` bilan har bir
+    so'rovda hisoblanadi (navbat uzunligi, kesh hit rate kabi holatlar uchun).
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: Any):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels: Any):
+        self._functions[self._key(labels)] = function
+
+    def value(self, **labels: Any) -> Optional[float]:
+        key = self._key(labels)
+        function = self._functions.get(key)
+        if function is None:
+            return self._values.get(key)
+        try:
+            return float(function())
+        except Exception as e:
+            logger.warning(f"Metrika {self.name} hisoblanmadi: {e}")
+            return None
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key in sorted(set(self._values) | set(self._functions)):
+            value = self.value(**dict(zip(self.labelnames, key)))
+            if value is not None:
+                lines.append(f"{self.name}{self._format_labels(key)} {value}")
+        return lines
+
+
+class HistogramFamily(MetricFamily):
+    """Label qiymatlari bo'yicha gistogrammalar to'plami"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[LabelKey, Histogram] = {}
+
+    def labels(self, **labels: Any) -> Histogram:
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = Histogram(self.buckets)
+        return child
+
+    def observe(self, value: float, **labels: Any):
+        self.labels(**labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Blok bajarilish vaqtini kuzatish (xato bo'lsa ham)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for upper, n in zip(child.buckets + (float('inf'),), child.counts):
+                cumulative += n
+                le = "+Inf" if upper == float('inf') else repr(float(upper))
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {child.sum}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Jarayon ichidagi metrikalar reestri"""
+
+    def __init__(self):
+        self._metrics: Dict[str, MetricFamily] = {}
+
+    def _register(self, cls, name: str, *args) -> Any:
+        """Metrikani ro'yxatdan o'tkazish (mavjud bo'lsa o'sha qaytariladi)"""
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> HistogramFamily:
+        return self._register(HistogramFamily, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Konversiya bosqichlari (pipe rejimida download va encode ustma-ust ketadi)
+CONVERSION_STAGES = ('get_file', 'download', 'probe', 'encode', 'read_back', 'upload', 'db', 'total')
+CONVERSION_STAGE_SECONDS = metrics.histogram(
+    "audiobot_conversion_stage_seconds",
+    "Audio konversiya bosqichlarining davomiyligi (soniya)",
+    ("stage",),
+)
+
+UPDATES_TOTAL = metrics.counter(
+    "audiobot_updates_total",
+    "Qayta ishlangan update'lar soni (tur bo'yicha)",
+    ("type",),
+)
+UPDATE_SECONDS = metrics.histogram(
+    "audiobot_update_seconds",
+    "Update'ni to'liq qayta ishlash vaqti (middleware + handler)",
+    ("type",),
+)
+MIDDLEWARE_SECONDS = metrics.histogram(
+    "audiobot_middleware_seconds",
+    "Middleware'ning o'z vaqti (keyingi handler'siz)",
+    ("middleware",),
+    FAST_BUCKETS,
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    "audiobot_db_query_seconds",
+    "Repozitoriy metodlarining bajarilish vaqti",
+    ("repository", "method"),
+    FAST_BUCKETS,
+)
+CONVERSION_QUEUE_DEPTH = metrics.gauge(
+    "audiobot_conversion_queue_depth",
+    "Navbatda kutayotgan konversiyalar soni",
+)
+CONVERSION_ACTIVE = metrics.gauge(
+    "audiobot_conversion_active",
+    "Band ishchilar (ishlayotgan ffmpeg enkoderlari) soni",
+)
+BROADCAST_MESSAGES_TOTAL = metrics.counter(
+    "audiobot_broadcast_messages_total",
+    "Broadcast xabarlari natija bo'yicha (yuborish tezligi - rate())",
+    ("result",),
+)
+CACHE_HIT_RATIO = metrics.gauge(
+    "audiobot_cache_hit_ratio",
+    "Kesh hit ulushi (0..1)",
+    ("cache",),
+)
+CACHE_ENTRIES = metrics.gauge(
+    "audiobot_cache_entries",
+    "Keshdagi yozuvlar soni",
+    ("cache",),
+)
+
+
+def register_cache_metrics(name: str, cache: Any):
+    """Keshni (``hits``/``misses`` hisoblagichlari bor obyekt) gauge'larga ulash"""
+    def hit_ratio() -> float:
+        total = cache.hits + cache.misses
+        return cache.hits / total if total else 0.0
+
+    CACHE_HIT_RATIO.set_function(hit_ratio, cache=name)
+    if hasattr(cache, '__len__'):
+        CACHE_ENTRIES.set_function(lambda: len(cache), cache=name)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Prometheus uchun ``/metrics`` endpoint'i"""
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int, path: str = "/metrics") -> web.AppRunner:
+    """Polling rejimi uchun alohida metrikalar HTTP serveri"""
+    app = web.Application()
+    app.router.add_get(path, metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrikalar serveri ishga tushdi: http://{host}:{port}{path}")
+    return runner
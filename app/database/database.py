@@ -1,45 +1,97 @@
 import os
-from typing import Optional
+from typing import Optional, Dict, Any
 from app.database.models import (
     DatabaseManager,
     UserRepository,
     ChannelRepository,
     ConversionRepository,
     StatisticsRepository,
-    RateLimitRepository
+    RateLimitRepository,
+    ConversionCacheRepository,
+    BroadcastRepository
 )
+from app.database.write_behind import WriteBehindBuffer
+from app.core.metrics import register_cache_metrics
+from app.utils.cache import TTLCache
 
 
 class Database:
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        pool_size: int = 4,
+        pragmas: Optional[Dict[str, Any]] = None,
+        flush_interval: float = 0.5,
+        flush_max_rows: int = 1000,
+        user_cache_size: int = 10000,
+        user_cache_ttl: float = 300.0,
+        conversion_cache_size: int = 50000
+    ):
         # Ma'lumotlar bazasi katalogini yaratish
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        self.manager = DatabaseManager(db_path)
-        self.users = UserRepository(self.manager)
+        self.manager = DatabaseManager(db_path, pool_size, pragmas)
+        self.writes = WriteBehindBuffer(self.manager, flush_interval, flush_max_rows)
+        self.users = UserRepository(
+            self.manager,
+            self.writes,
+            TTLCache(user_cache_size, user_cache_ttl)
+        )
         self.channels = ChannelRepository(self.manager)
-        self.conversions = ConversionRepository(self.manager)
+        self.conversions = ConversionRepository(self.manager, self.writes)
         self.statistics = StatisticsRepository(self.manager)
         self.rate_limits = RateLimitRepository(self.manager)
+        self.conversion_cache = ConversionCacheRepository(self.manager, conversion_cache_size)
+        self.broadcasts = BroadcastRepository(self.manager)
+        register_cache_metrics('users', self.users.cache)
+        register_cache_metrics('conversion', self.conversion_cache)
 
     async def init(self):
         await self.manager.init_database()
+        self.writes.start()
 
     async def close(self):
-        pass
+        # Buffer'dagi yozuvlar writer yopilishidan oldin yozilishi kerak
+        await self.writes.stop()
+        await self.manager.close()
 
 
 # Global database instance
 db: Optional[Database] = None
 
 
-async def init_database(db_path: str) -> Database:
+async def init_database(
+    db_path: str,
+    pool_size: int = 4,
+    pragmas: Optional[Dict[str, Any]] = None,
+    flush_interval: float = 0.5,
+    flush_max_rows: int = 1000,
+    user_cache_size: int = 10000,
+    user_cache_ttl: float = 300.0,
+    conversion_cache_size: int = 50000
+) -> Database:
     global db
-    db = Database(db_path)
+    db = Database(
+        db_path,
+        pool_size,
+        pragmas,
+        flush_interval,
+        flush_max_rows,
+        user_cache_size,
+        user_cache_ttl,
+        conversion_cache_size
+    )
     await db.init()
     return db
 
 
+async def close_database():
+    global db
+    if db is not None:
+        await db.close()
+        db = None
+
+
 def get_database() -> Database:
     if db is None:
         raise RuntimeError("Database not initialized")
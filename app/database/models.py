@@ -1,8 +1,21 @@
+import asyncio
+import functools
+import inspect
+import time
 import aiosqlite
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import (
+    Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Tuple, TYPE_CHECKING
+)
 from enum import Enum
 
+from app.core.metrics import DB_QUERY_SECONDS
+from app.utils.cache import TTLCache
+
+if TYPE_CHECKING:
+    from app.database.write_behind import WriteBehindBuffer
+
 
 class UserStatus(Enum):
     ACTIVE = "active"
@@ -22,14 +35,241 @@ class RequestStatus(Enum):
     REJECTED = "rejected"
 
 
+class BroadcastStatus(Enum):
+    RUNNING = "running"
+    PAUSED = "paused"
+    CANCELLED = "cancelled"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+WriteJob = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+def timed_repository(cls):
+    """Repozitoriyning ochiq async metodlari vaqtini ``DB_QUERY_SECONDS``ga yozish"""
+    def wrap(name: str, method: Callable[..., Awaitable[Any]]):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                DB_QUERY_SECONDS.observe(
+                    time.perf_counter() - started, repository=cls.__name__, method=name
+                )
+        return timed
+
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith('_') and inspect.iscoroutinefunction(attr):
+            setattr(cls, name, wrap(name, attr))
+    return cls
+
+
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
+    'busy_timeout': 5000,
+}
+
+
 class DatabaseManager:
-    def __init__(self, db_path: str):
+    """
+    SQLite ulanishlarini boshqarish
+
+    O'qish so'rovlari reader pool'i orqali parallel bajariladi, barcha
+    yozuvlar esa bitta writer task navbatidan ketma-ket o'tadi. WAL
+    rejimida reader'lar writer'ni kutib qolmaydi.
+    """
+
+    # Bitta tranzaksiyada bajariladigan maksimal yozuv soni
+    WRITE_BATCH_LIMIT = 256
+
+    def __init__(self, db_path: str, pool_size: int = 4, pragmas: Optional[Dict[str, Any]] = None):
         self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self._connections: List[aiosqlite.Connection] = []
+        self._pool: Optional[asyncio.Queue] = None
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
 
     async def init_database(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            await self._create_tables(db)
-            await db.commit()
+        await self._open_writer()
+        await self.run_write(self._create_tables)
+        await self._open_pool()
+
+    async def _apply_pragmas(self, conn: aiosqlite.Connection, read_only: bool = False):
+        """Ulanish uchun PRAGMA sozlamalarini qo'llash"""
+        for name, value in self.pragmas.items():
+            if value is None or value == '':
+                continue
+            # journal_mode fayl darajasida saqlanadi, uni faqat writer o'rnatadi
+            if read_only and name == 'journal_mode':
+                continue
+            await conn.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            await conn.execute("PRAGMA query_only = 1")
+
+    async def _open_writer(self):
+        """Yagona writer ulanishi va uning task'ini ishga tushirish"""
+        if self._writer is not None:
+            return
+
+        # isolation_level=None: tranzaksiyalarni writer task o'zi boshqaradi
+        writer = await aiosqlite.connect(self.db_path, isolation_level=None)
+        writer.row_factory = aiosqlite.Row
+        await self._apply_pragmas(writer)
+        self._writer = writer
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def _open_pool(self):
+        """Uzoq yashovchi reader ulanishlar pool'ini ochish"""
+        if self._pool is not None:
+            return
+
+        pool: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.pool_size):
+            conn = await aiosqlite.connect(self.db_path)
+            conn.row_factory = aiosqlite.Row
+            await self._apply_pragmas(conn, read_only=True)
+            self._connections.append(conn)
+            pool.put_nowait(conn)
+        self._pool = pool
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Pool'dan o'qish uchun ulanish olish va ishdan so'ng qaytarish"""
+        if self._pool is None:
+            raise RuntimeError("Database pool ochilmagan")
+
+        conn = await self._pool.get()
+        try:
+            yield conn
+        finally:
+            # Yakunlanmagan tranzaksiya keyingi foydalanuvchiga o'tmasligi kerak
+            try:
+                if conn.in_transaction:
+                    await conn.rollback()
+            finally:
+                self._pool.put_nowait(conn)
+
+    async def run_write(self, job: WriteJob) -> Any:
+        """
+        Yozuv funksiyasini writer navbatiga qo'yish va natijasini kutish
+
+        ``job`` writer ulanishini qabul qiladi va commit qilmasligi kerak -
+        commit'ni writer task bajaradi.
+        """
+        if self._write_queue is None:
+            raise RuntimeError("Database writer ishga tushirilmagan")
+
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((job, future))
+        return await future
+
+    async def execute_write(self, sql: str, parameters: Iterable[Any] = ()) -> int:
+        """Bitta yozuv so'rovini bajarish, o'zgargan qatorlar sonini qaytaradi"""
+        async def job(conn: aiosqlite.Connection) -> int:
+            cursor = await conn.execute(sql, tuple(parameters))
+            rowcount = cursor.rowcount
+            await cursor.close()
+            return rowcount
+
+        return await self.run_write(job)
+
+    async def _writer_loop(self):
+        """Navbatdagi yozuvlarni guruhlab, bitta tranzaksiyada commit qilish"""
+        queue = self._write_queue
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            while len(batch) < self.WRITE_BATCH_LIMIT and not queue.empty():
+                next_item = queue.get_nowait()
+                if next_item is None:
+                    stop = True
+                    break
+                batch.append(next_item)
+
+            await self._run_batch(batch)
+            if stop:
+                return
+
+    async def _run_batch(self, batch: List[Tuple[WriteJob, asyncio.Future]]):
+        conn = self._writer
+        results: List[Tuple[asyncio.Future, Any]] = []
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                # Har bir yozuv o'z savepoint'ida: bittasining xatosi boshqalarni buzmaydi
+                await conn.execute("SAVEPOINT write_job")
+                try:
+                    result = await job(conn)
+                except Exception as e:
+                    await conn.execute("ROLLBACK TO write_job")
+                    await conn.execute("RELEASE write_job")
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                await conn.execute("RELEASE write_job")
+                results.append((future, result))
+            await conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                if conn.in_transaction:
+                    await conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in results:
+            if not future.done():
+                future.set_result(result)
+
+    async def backup(self, target_path: str):
+        """WAL rejimida ham to'liq nusxa olish (SQLite backup API)"""
+        async with self.acquire() as conn:
+            async with aiosqlite.connect(target_path) as target:
+                await conn.backup(target)
+
+    async def close(self):
+        """Writer navbatini yakunlash va barcha ulanishlarni yopish"""
+        if self._writer_task is not None:
+            self._write_queue.put_nowait(None)
+            try:
+                await self._writer_task
+            except Exception as e:
+                print(f"Writer task'ni yakunlashda xato: {e}")
+            self._writer_task = None
+            self._write_queue = None
+
+        connections, self._connections = self._connections, []
+        if self._writer is not None:
+            connections.append(self._writer)
+            self._writer = None
+        self._pool = None
+        for conn in connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"Ulanishni yopishda xato: {e}")
+
+    async def _add_missing_columns(self, db: aiosqlite.Connection, table: str, columns: Dict[str, str]):
+        """Jadvalda yo'q ustunlarni ALTER TABLE bilan qo'shish"""
+        cursor = await db.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in await cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                await db.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
 
     async def _create_tables(self, db: aiosqlite.Connection):
         # Foydalanuvchilar jadvali
@@ -93,7 +333,11 @@ class DatabaseManager:
                 conversion_date DATETIME DEFAULT CURRENT_TIMESTAMP,
                 processing_time REAL,
                 success BOOLEAN DEFAULT 1,
-                error_message TEXT
+                error_message TEXT,
+                duration REAL,
+                codec TEXT,
+                channels INTEGER,
+                encoder_profile TEXT
             )
         ''')
 
@@ -131,6 +375,84 @@ class DatabaseManager:
             )
         ''')
 
+        # Konversiya keshi jadvali
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS conversion_cache (
+                file_unique_id TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                voice_file_id TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_used DATETIME DEFAULT CURRENT_TIMESTAMP,
+                hits INTEGER DEFAULT 0,
+                PRIMARY KEY (file_unique_id, settings)
+            )
+        ''')
+
+        # Broadcast vazifalari jadvali (cursor - oxirgi tasdiqlangan users.id)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id BIGINT,
+                target_type TEXT NOT NULL,
+                message_text TEXT,
+                from_chat_id BIGINT,
+                message_id INTEGER,
+                status TEXT DEFAULT 'running',
+                cursor INTEGER DEFAULT 0,
+                total_count INTEGER DEFAULT 0,
+                success_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                blocked_count INTEGER DEFAULT 0,
+                retry_count INTEGER DEFAULT 0,
+                progress_chat_id BIGINT,
+                progress_message_id INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                finished_at DATETIME
+            )
+        ''')
+
+        # Yakunlangan broadcast'lar tarixi
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER,
+                admin_id BIGINT,
+                target_type TEXT,
+                message_preview TEXT,
+                status TEXT,
+                total_count INTEGER DEFAULT 0,
+                success_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                blocked_count INTEGER DEFAULT 0,
+                duration REAL DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Tarix bo'yicha umumiy hisoblagichlar (bitta qator, har yozuvda yangilanadi)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total_broadcasts INTEGER DEFAULT 0,
+                total_messages INTEGER DEFAULT 0,
+                total_success INTEGER DEFAULT 0
+            )
+        ''')
+        await db.execute('INSERT OR IGNORE INTO broadcast_stats (id) VALUES (1)')
+
+        # Eski bazalar uchun yangi ustunlar
+        await self._add_missing_columns(db, 'audio_conversions', {
+            'duration': 'REAL',
+            'codec': 'TEXT',
+            'channels': 'INTEGER',
+            'encoder_profile': 'TEXT',
+        })
+        await self._add_missing_columns(db, 'broadcast_jobs', {
+            'progress_chat_id': 'BIGINT',
+            'progress_message_id': 'INTEGER',
+        })
+
         # Indexlar yaratish
         await db.execute('CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)')
         await db.execute('CREATE INDEX IF NOT EXISTS idx_users_status ON users(status)')
@@ -140,68 +462,136 @@ class DatabaseManager:
         await db.execute('CREATE INDEX IF NOT EXISTS idx_conversions_date ON audio_conversions(conversion_date)')
         await db.execute('CREATE INDEX IF NOT EXISTS idx_activity_user_id ON user_activity(user_id)')
         await db.execute('CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON user_activity(timestamp)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_conversion_cache_last_used ON conversion_cache(last_used)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(status)')
 
 
+@timed_repository
 class UserRepository:
-    def __init__(self, db_manager: DatabaseManager):
+    # update_user orqali o'zgartirish mumkin bo'lgan ustunlar
+    UPDATABLE_FIELDS = ('username', 'first_name', 'last_name', 'language_code', 'status', 'is_admin')
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        write_buffer: Optional["WriteBehindBuffer"] = None,
+        cache: Optional[TTLCache] = None
+    ):
         self.db = db_manager
+        self.write_buffer = write_buffer
+        self.cache = cache or TTLCache()
+        # Har bir invalidatsiyada oshadi: eskirgan SELECT natijasi keshga tushmasligi uchun
+        self._cache_generation = 0
+
+    def _invalidate(self, user_id: int):
+        self._cache_generation += 1
+        self.cache.pop(user_id)
 
     async def create_user(self, user_data: Dict[str, Any]) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            try:
-                await db.execute('''
-                    INSERT OR IGNORE INTO users 
-                    (user_id, username, first_name, last_name, language_code)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    user_data['user_id'],
-                    user_data.get('username'),
-                    user_data.get('first_name'),
-                    user_data.get('last_name'),
-                    user_data.get('language_code', 'uz')
-                ))
-                await db.commit()
-                return True
-            except Exception as e:
-                print(f"User yaratishda xato: {e}")
-                return False
+        try:
+            await self.db.execute_write('''
+                INSERT OR IGNORE INTO users 
+                (user_id, username, first_name, last_name, language_code)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                user_data['user_id'],
+                user_data.get('username'),
+                user_data.get('first_name'),
+                user_data.get('last_name'),
+                user_data.get('language_code', 'uz')
+            ))
+            return True
+        except Exception as e:
+            print(f"User yaratishda xato: {e}")
+            return False
 
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
+
+        generation = self._cache_generation
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 'SELECT * FROM users WHERE user_id = ?', (user_id,)
             )
             row = await cursor.fetchone()
-            return dict(row) if row else None
+        if not row:
+            return None
 
-    async def update_user_activity(self, user_id: int):
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute(
-                'UPDATE users SET last_activity = CURRENT_TIMESTAMP WHERE user_id = ?',
-                (user_id,)
+        user = dict(row)
+        # Buffer'da yozilmagan o'zgarishlar bo'lsa, bazadagi qator hali eski
+        pending = self.write_buffer is not None and self.write_buffer.has_pending_user(user_id)
+        if generation == self._cache_generation and not pending:
+            self.cache.set(user_id, user)
+        return dict(user)
+
+    def record_activity(self, user_data: Dict[str, Any]):
+        """Foydalanuvchini yaratish/yangilash va faollikni belgilash (write-behind)"""
+        last_activity = self.write_buffer.record_user(user_data)
+
+        # Keshdagi qatorni ham yangilash (write-through)
+        cached = self.cache.peek(user_data['user_id'])
+        if cached is not None:
+            cached.update({
+                'username': user_data.get('username'),
+                'first_name': user_data.get('first_name'),
+                'last_name': user_data.get('last_name'),
+                'language_code': user_data.get('language_code', 'uz'),
+                'last_activity': last_activity,
+            })
+
+    async def update_user(self, user_id: int, fields: Dict[str, Any]) -> bool:
+        """Foydalanuvchi ustunlarini yangilash"""
+        updates = {key: value for key, value in fields.items() if key in self.UPDATABLE_FIELDS}
+        if not updates:
+            return False
+
+        assignments = ", ".join(f"{key} = ?" for key in updates)
+        try:
+            await self.db.execute_write(
+                f'UPDATE users SET {assignments} WHERE user_id = ?',
+                (*updates.values(), user_id)
             )
-            await db.commit()
+            return True
+        finally:
+            self._invalidate(user_id)
+
+    async def update_user_activity(self, user_id: int):
+        await self.db.execute_write(
+            'UPDATE users SET last_activity = CURRENT_TIMESTAMP WHERE user_id = ?',
+            (user_id,)
+        )
 
     async def increment_conversions(self, user_id: int):
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute(
-                'UPDATE users SET total_conversions = total_conversions + 1 WHERE user_id = ?',
-                (user_id,)
-            )
-            await db.commit()
+        if self.write_buffer is None:
+            try:
+                await self.db.execute_write(
+                    'UPDATE users SET total_conversions = total_conversions + 1 WHERE user_id = ?',
+                    (user_id,)
+                )
+            finally:
+                self._invalidate(user_id)
+            return
 
-    async def set_user_status(self, user_id: int, status: UserStatus):
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute(
+        # Hisoblagich write-behind orqali yoziladi, keshdagi qiymat darhol yangilanadi
+        self.write_buffer.record_increment(user_id)
+        cached = self.cache.peek(user_id)
+        if cached is not None:
+            cached['total_conversions'] = (cached.get('total_conversions') or 0) + 1
+
+    async def set_user_status(self, user_id: int, status: UserStatus | str):
+        status_value = status.value if isinstance(status, UserStatus) else status
+        try:
+            await self.db.execute_write(
                 'UPDATE users SET status = ? WHERE user_id = ?',
-                (status.value, user_id)
+                (status_value, user_id)
             )
-            await db.commit()
+        finally:
+            self._invalidate(user_id)
 
     async def get_all_users(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 'SELECT * FROM users ORDER BY registration_date DESC LIMIT ? OFFSET ?',
                 (limit, offset)
@@ -209,9 +599,54 @@ class UserRepository:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+    async def count_users(self, status: Optional[str] = None) -> int:
+        async with self.db.acquire() as db:
+            if status is None:
+                cursor = await db.execute('SELECT COUNT(*) FROM users')
+            else:
+                cursor = await db.execute('SELECT COUNT(*) FROM users WHERE status = ?', (status,))
+            result = await cursor.fetchone()
+            return result[0] if result else 0
+
+    async def iter_user_pages(
+        self,
+        status: Optional[str] = None,
+        batch_size: int = 1000,
+        after_id: int = 0
+    ) -> AsyncIterator[List[Tuple[int, int]]]:
+        """
+        ``(id, user_id)`` sahifalari, ``id`` bo'yicha keyset paginatsiya bilan
+
+        Har bir sahifa alohida ulanishda o'qiladi - iterator sekin iste'mol
+        qilinsa ham pool band bo'lmaydi. Xotira sahifa hajmi bilan cheklangan.
+        """
+        status_filter = 'AND status = ? ' if status is not None else ''
+        sql = f'SELECT id, user_id FROM users WHERE id > ? {status_filter}ORDER BY id LIMIT ?'
+        while True:
+            params = (after_id, status, batch_size) if status is not None else (after_id, batch_size)
+            async with self.db.acquire() as db:
+                cursor = await db.execute(sql, params)
+                rows = [(row[0], row[1]) for row in await cursor.fetchall()]
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    async def iter_user_ids(
+        self,
+        status: Optional[str] = None,
+        batch_size: int = 1000,
+        after_id: int = 0
+    ) -> AsyncIterator[int]:
+        """Foydalanuvchilarning ``user_id``lari (status bo'yicha filtr SQL'da)"""
+        async for page in self.iter_user_pages(status, batch_size, after_id):
+            for _, user_id in page:
+                yield user_id
+
     async def get_users_by_status(self, status: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 'SELECT * FROM users WHERE status = ? ORDER BY last_activity DESC LIMIT ? OFFSET ?',
                 (status, limit, offset)
@@ -220,8 +655,7 @@ class UserRepository:
             return [dict(row) for row in rows]
 
     async def get_admin_users(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 'SELECT * FROM users WHERE is_admin = 1 ORDER BY registration_date DESC LIMIT ? OFFSET ?',
                 (limit, offset)
@@ -230,73 +664,89 @@ class UserRepository:
             return [dict(row) for row in rows]
 
 
+@timed_repository
 class ChannelRepository:
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
+        # Faol majburiy kanallar snapshot'i - faqat o'zgartirishlardan keyin qayta yuklanadi
+        self._active_channels: Optional[Tuple[Dict[str, Any], ...]] = None
+        self._active_lock = asyncio.Lock()
+        self.version = 0
+
+    def invalidate_active_channels(self):
+        """Snapshot'ni eskirgan deb belgilash (versiya oshadi)"""
+        self.version += 1
+        self._active_channels = None
+
+    async def _load_active_channels(self) -> Tuple[Dict[str, Any], ...]:
+        async with self._active_lock:
+            while self._active_channels is None:
+                version = self.version
+                async with self.db.acquire() as db:
+                    cursor = await db.execute(
+                        'SELECT * FROM force_subscribe_channels WHERE is_active = 1'
+                    )
+                    rows = await cursor.fetchall()
+                # O'qish paytida o'zgarish bo'lgan bo'lsa, qaytadan yuklanadi
+                if version == self.version:
+                    self._active_channels = tuple(dict(row) for row in rows)
+            return self._active_channels
 
     async def add_force_channel(self, channel_data: Dict[str, Any]) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            try:
-                await db.execute('''
-                    INSERT INTO force_subscribe_channels 
-                    (channel_id, channel_username, channel_title, channel_type, added_by, invite_link)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    channel_data['channel_id'],
-                    channel_data.get('channel_username'),
-                    channel_data.get('channel_title'),
-                    channel_data.get('channel_type', 'channel'),
-                    channel_data['added_by'],
-                    channel_data.get('invite_link')
-                ))
-                await db.commit()
-                return True
-            except Exception as e:
-                print(f"Kanal qo'shishda xato: {e}")
-                return False
+        try:
+            await self.db.execute_write('''
+                INSERT INTO force_subscribe_channels 
+                (channel_id, channel_username, channel_title, channel_type, added_by, invite_link)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                channel_data['channel_id'],
+                channel_data.get('channel_username'),
+                channel_data.get('channel_title'),
+                channel_data.get('channel_type', 'channel'),
+                channel_data['added_by'],
+                channel_data.get('invite_link')
+            ))
+            self.invalidate_active_channels()
+            return True
+        except Exception as e:
+            print(f"Kanal qo'shishda xato: {e}")
+            return False
 
     async def get_active_force_channels(self) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                'SELECT * FROM force_subscribe_channels WHERE is_active = 1'
-            )
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        channels = self._active_channels
+        if channels is None:
+            channels = await self._load_active_channels()
+        return [dict(channel) for channel in channels]
 
     async def deactivate_channel(self, channel_id: int) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute(
-                'UPDATE force_subscribe_channels SET is_active = 0 WHERE channel_id = ?',
-                (channel_id,)
-            )
-            await db.commit()
-            return True
+        await self.db.execute_write(
+            'UPDATE force_subscribe_channels SET is_active = 0 WHERE channel_id = ?',
+            (channel_id,)
+        )
+        self.invalidate_active_channels()
+        return True
 
     async def create_channel_request(self, request_data: Dict[str, Any]) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            try:
-                await db.execute('''
-                    INSERT INTO channel_requests 
-                    (channel_id, channel_username, channel_title, channel_type, requested_by, invite_link)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    request_data['channel_id'],
-                    request_data.get('channel_username'),
-                    request_data.get('channel_title'),
-                    request_data.get('channel_type', 'channel'),
-                    request_data['requested_by'],
-                    request_data.get('invite_link')
-                ))
-                await db.commit()
-                return True
-            except Exception as e:
-                print(f"So'rov yaratishda xato: {e}")
-                return False
+        try:
+            await self.db.execute_write('''
+                INSERT INTO channel_requests 
+                (channel_id, channel_username, channel_title, channel_type, requested_by, invite_link)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                request_data['channel_id'],
+                request_data.get('channel_username'),
+                request_data.get('channel_title'),
+                request_data.get('channel_type', 'channel'),
+                request_data['requested_by'],
+                request_data.get('invite_link')
+            ))
+            return True
+        except Exception as e:
+            print(f"So'rov yaratishda xato: {e}")
+            return False
 
     async def get_pending_requests(self) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 'SELECT * FROM channel_requests WHERE status = "pending" ORDER BY request_date ASC'
             )
@@ -304,8 +754,7 @@ class ChannelRepository:
             return [dict(row) for row in rows]
 
     async def get_user_requests(self, user_id: int, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 '''
                 SELECT * FROM channel_requests
@@ -319,8 +768,7 @@ class ChannelRepository:
             return [dict(row) for row in rows]
 
     async def get_request_by_id(self, request_id: int) -> Optional[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 'SELECT * FROM channel_requests WHERE id = ?',
                 (request_id,)
@@ -334,8 +782,7 @@ class ChannelRepository:
         limit: int = 20,
         offset: int = 0
     ) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 '''
                 SELECT * FROM channel_requests
@@ -349,8 +796,7 @@ class ChannelRepository:
             return [dict(row) for row in rows]
 
     async def get_request_stats(self) -> Dict[str, int]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute(
                 '''
                 SELECT
@@ -367,55 +813,59 @@ class ChannelRepository:
             return dict(row)
 
     async def approve_request(self, request_id: int, admin_id: int, comment: str = None) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute('''
-                UPDATE channel_requests 
-                SET status = "approved", reviewed_by = ?, review_date = CURRENT_TIMESTAMP, review_comment = ?
-                WHERE id = ?
-            ''', (admin_id, comment, request_id))
-            await db.commit()
-            return True
+        await self.db.execute_write('''
+            UPDATE channel_requests 
+            SET status = "approved", reviewed_by = ?, review_date = CURRENT_TIMESTAMP, review_comment = ?
+            WHERE id = ?
+        ''', (admin_id, comment, request_id))
+        return True
 
     async def reject_request(self, request_id: int, admin_id: int, comment: str = None) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute('''
-                UPDATE channel_requests 
-                SET status = "rejected", reviewed_by = ?, review_date = CURRENT_TIMESTAMP, review_comment = ?
-                WHERE id = ?
-            ''', (admin_id, comment, request_id))
-            await db.commit()
-            return True
+        await self.db.execute_write('''
+            UPDATE channel_requests 
+            SET status = "rejected", reviewed_by = ?, review_date = CURRENT_TIMESTAMP, review_comment = ?
+            WHERE id = ?
+        ''', (admin_id, comment, request_id))
+        return True
 
 
+@timed_repository
 class ConversionRepository:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, write_buffer: Optional["WriteBehindBuffer"] = None):
         self.db = db_manager
+        self.write_buffer = write_buffer
+
+    def record_conversion(self, conversion_data: Dict[str, Any]):
+        """Konversiya log'ini write-behind buffer orqali yozish"""
+        self.write_buffer.record_conversion(conversion_data)
 
     async def log_conversion(self, conversion_data: Dict[str, Any]) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            try:
-                await db.execute('''
-                    INSERT INTO audio_conversions 
-                    (user_id, original_filename, file_size, audio_format, processing_time, success, error_message)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    conversion_data['user_id'],
-                    conversion_data.get('original_filename'),
-                    conversion_data.get('file_size'),
-                    conversion_data.get('audio_format'),
-                    conversion_data.get('processing_time'),
-                    conversion_data.get('success', True),
-                    conversion_data.get('error_message')
-                ))
-                await db.commit()
-                return True
-            except Exception as e:
-                print(f"Konversiya log'da xato: {e}")
-                return False
+        try:
+            await self.db.execute_write('''
+                INSERT INTO audio_conversions 
+                (user_id, original_filename, file_size, audio_format, processing_time, success, error_message,
+                 duration, codec, channels, encoder_profile)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                conversion_data['user_id'],
+                conversion_data.get('original_filename'),
+                conversion_data.get('file_size'),
+                conversion_data.get('audio_format'),
+                conversion_data.get('processing_time'),
+                conversion_data.get('success', True),
+                conversion_data.get('error_message'),
+                conversion_data.get('duration'),
+                conversion_data.get('codec'),
+                conversion_data.get('channels'),
+                conversion_data.get('encoder_profile')
+            ))
+            return True
+        except Exception as e:
+            print(f"Konversiya log'da xato: {e}")
+            return False
 
     async def get_user_conversions(self, user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute('''
                 SELECT * FROM audio_conversions 
                 WHERE user_id = ? 
@@ -426,19 +876,20 @@ class ConversionRepository:
             return [dict(row) for row in rows]
 
 
+@timed_repository
 class StatisticsRepository:
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
 
     async def get_user_count(self) -> int:
-        async with aiosqlite.connect(self.db.db_path) as db:
+        async with self.db.acquire() as db:
             cursor = await db.execute('SELECT COUNT(*) FROM users')
             result = await cursor.fetchone()
             return result[0]
 
     async def get_active_users_today(self) -> int:
         today = datetime.now().date()
-        async with aiosqlite.connect(self.db.db_path) as db:
+        async with self.db.acquire() as db:
             cursor = await db.execute('''
                 SELECT COUNT(DISTINCT user_id) FROM user_activity 
                 WHERE DATE(timestamp) = ?
@@ -448,7 +899,7 @@ class StatisticsRepository:
 
     async def get_conversions_today(self) -> int:
         today = datetime.now().date()
-        async with aiosqlite.connect(self.db.db_path) as db:
+        async with self.db.acquire() as db:
             cursor = await db.execute('''
                 SELECT COUNT(*) FROM audio_conversions 
                 WHERE DATE(conversion_date) = ?
@@ -457,8 +908,7 @@ class StatisticsRepository:
             return result[0]
 
     async def get_popular_formats(self, limit: int = 10) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self.db.acquire() as db:
             cursor = await db.execute('''
                 SELECT audio_format, COUNT(*) as count 
                 FROM audio_conversions 
@@ -470,21 +920,42 @@ class StatisticsRepository:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+    async def get_processing_stats(self) -> Dict[str, Any]:
+        """Qayta ishlangan audio soniyalari va real-time factor (jami va bugun)"""
+        today = datetime.now().date()
+        async with self.db.acquire() as db:
+            cursor = await db.execute('''
+                SELECT
+                    COALESCE(SUM(duration), 0) AS audio_seconds,
+                    COALESCE(SUM(processing_time), 0) AS processing_seconds,
+                    COALESCE(SUM(CASE WHEN DATE(conversion_date) = ? THEN duration END), 0) AS audio_seconds_today,
+                    COALESCE(SUM(CASE WHEN DATE(conversion_date) = ? THEN processing_time END), 0) AS processing_seconds_today
+                FROM audio_conversions
+                WHERE success = 1 AND duration IS NOT NULL
+            ''', (today, today))
+            row = dict(await cursor.fetchone())
+
+        for suffix in ('', '_today'):
+            audio_seconds = row[f'audio_seconds{suffix}']
+            row[f'rtf{suffix}'] = (
+                row[f'processing_seconds{suffix}'] / audio_seconds if audio_seconds else 0.0
+            )
+        return row
+
     async def log_activity(self, user_id: int, activity_type: str, activity_data: str = None):
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute('''
-                INSERT INTO user_activity (user_id, activity_type, activity_data)
-                VALUES (?, ?, ?)
-            ''', (user_id, activity_type, activity_data))
-            await db.commit()
+        await self.db.execute_write('''
+            INSERT INTO user_activity (user_id, activity_type, activity_data)
+            VALUES (?, ?, ?)
+        ''', (user_id, activity_type, activity_data))
 
 
+@timed_repository
 class RateLimitRepository:
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
 
     async def check_rate_limit(self, user_id: int, max_messages: int, window_seconds: int) -> bool:
-        async with aiosqlite.connect(self.db.db_path) as db:
+        async def job(db: aiosqlite.Connection) -> bool:
             now = datetime.now()
             window_start = now - timedelta(seconds=window_seconds)
             
@@ -507,7 +978,6 @@ class RateLimitRepository:
                     'INSERT INTO rate_limits (user_id, message_count) VALUES (?, 1)',
                     (user_id,)
                 )
-                await db.commit()
                 return True
             
             message_count = result[0]
@@ -519,5 +989,218 @@ class RateLimitRepository:
                 'UPDATE rate_limits SET message_count = message_count + 1 WHERE user_id = ?',
                 (user_id,)
             )
-            await db.commit()
             return True
+
+        return await self.db.run_write(job)
+
+
+@timed_repository
+class ConversionCacheRepository:
+    """
+    Konversiya keshi: ``file_unique_id`` + enkoder sozlamalari -> yuborilgan voice ``file_id``
+
+    Eng kam ishlatilgan yozuvlar ``max_entries`` dan oshganda o'chiriladi (LRU).
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_entries: int = 50000):
+        self.db = db_manager
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_voice(self, file_unique_id: str, settings: str) -> Optional[str]:
+        async with self.db.acquire() as db:
+            cursor = await db.execute(
+                'SELECT voice_file_id FROM conversion_cache WHERE file_unique_id = ? AND settings = ?',
+                (file_unique_id, settings)
+            )
+            row = await cursor.fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        await self.db.execute_write('''
+            UPDATE conversion_cache SET last_used = CURRENT_TIMESTAMP, hits = hits + 1
+            WHERE file_unique_id = ? AND settings = ?
+        ''', (file_unique_id, settings))
+        return row[0]
+
+    async def store_voice(self, file_unique_id: str, settings: str, voice_file_id: str) -> bool:
+        async def job(db: aiosqlite.Connection):
+            await db.execute('''
+                INSERT INTO conversion_cache (file_unique_id, settings, voice_file_id)
+                VALUES (?, ?, ?)
+                ON CONFLICT(file_unique_id, settings) DO UPDATE SET
+                    voice_file_id = excluded.voice_file_id,
+                    last_used = CURRENT_TIMESTAMP
+            ''', (file_unique_id, settings, voice_file_id))
+            await db.execute('''
+                DELETE FROM conversion_cache WHERE rowid IN (
+                    SELECT rowid FROM conversion_cache
+                    ORDER BY last_used ASC
+                    LIMIT MAX(0, (SELECT COUNT(*) FROM conversion_cache) - ?)
+                )
+            ''', (self.max_entries,))
+
+        try:
+            await self.db.run_write(job)
+            return True
+        except Exception as e:
+            print(f"Konversiya keshiga yozishda xato: {e}")
+            return False
+
+    async def invalidate(self, file_unique_id: str, settings: str):
+        await self.db.execute_write(
+            'DELETE FROM conversion_cache WHERE file_unique_id = ? AND settings = ?',
+            (file_unique_id, settings)
+        )
+
+    async def stats(self) -> Dict[str, Any]:
+        """Kesh statistikasi (TTLCache.stats bilan bir xil ko'rinishda)"""
+        async with self.db.acquire() as db:
+            cursor = await db.execute('SELECT COUNT(*) FROM conversion_cache')
+            result = await cursor.fetchone()
+
+        total = self.hits + self.misses
+        return {
+            'size': result[0],
+            'maxsize': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+        }
+
+
+@timed_repository
+class BroadcastRepository:
+    """Broadcast vazifalari: holat, cursor va hisoblagichlar"""
+
+    # Cursor bilan birga saqlanadigan hisoblagichlar
+    COUNTERS = ('success_count', 'failed_count', 'blocked_count', 'retry_count')
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+
+    async def create_job(self, job_data: Dict[str, Any]) -> int:
+        async def job(db: aiosqlite.Connection) -> int:
+            cursor = await db.execute('''
+                INSERT INTO broadcast_jobs
+                (admin_id, target_type, message_text, from_chat_id, message_id, total_count,
+                 progress_chat_id, progress_message_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                job_data.get('admin_id'),
+                job_data['target_type'],
+                job_data.get('message_text'),
+                job_data.get('from_chat_id'),
+                job_data.get('message_id'),
+                job_data.get('total_count', 0),
+                job_data.get('progress_chat_id'),
+                job_data.get('progress_message_id'),
+            ))
+            return cursor.lastrowid
+
+        return await self.db.run_write(job)
+
+    async def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        async with self.db.acquire() as db:
+            cursor = await db.execute('SELECT * FROM broadcast_jobs WHERE id = ?', (job_id,))
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
+    async def get_jobs_by_status(self, status: BroadcastStatus | str) -> List[Dict[str, Any]]:
+        status_value = status.value if isinstance(status, BroadcastStatus) else status
+        async with self.db.acquire() as db:
+            cursor = await db.execute(
+                'SELECT * FROM broadcast_jobs WHERE status = ? ORDER BY id',
+                (status_value,)
+            )
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def get_active_jobs(self) -> List[Dict[str, Any]]:
+        """Ishlayotgan va pauzadagi vazifalar"""
+        async with self.db.acquire() as db:
+            cursor = await db.execute(
+                "SELECT * FROM broadcast_jobs WHERE status IN ('running', 'paused') ORDER BY id"
+            )
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def save_progress(self, job_id: int, cursor: int, counters: Dict[str, int]):
+        """Checkpoint: cursor va hisoblagichlarni yozish"""
+        await self.db.execute_write('''
+            UPDATE broadcast_jobs
+            SET cursor = ?, success_count = ?, failed_count = ?, blocked_count = ?, retry_count = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (cursor, *(counters.get(name, 0) for name in self.COUNTERS), job_id))
+
+    async def add_history(self, entries: List[Dict[str, Any]]) -> int:
+        """Tarixga yozuvlar qo'shish; umumiy hisoblagichlar shu tranzaksiyada yangilanadi"""
+        async def job(db: aiosqlite.Connection) -> int:
+            await db.executemany('''
+                INSERT INTO broadcast_history
+                (job_id, admin_id, target_type, message_preview, status,
+                 total_count, success_count, failed_count, blocked_count, duration, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                entry.get('job_id'),
+                entry.get('admin_id'),
+                entry.get('target_type'),
+                entry.get('message_preview'),
+                entry.get('status'),
+                entry.get('total_count', 0),
+                entry.get('success_count', 0),
+                entry.get('failed_count', 0),
+                entry.get('blocked_count', 0),
+                entry.get('duration', 0),
+                # Mahalliy vaqt - eski JSON tarixidagi vaqtlar bilan bir xil
+                entry.get('created_at') or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            ) for entry in entries])
+            await db.execute('''
+                UPDATE broadcast_stats
+                SET total_broadcasts = total_broadcasts + ?,
+                    total_messages = total_messages + ?,
+                    total_success = total_success + ?
+                WHERE id = 1
+            ''', (
+                len(entries),
+                sum(entry.get('total_count', 0) for entry in entries),
+                sum(entry.get('success_count', 0) for entry in entries),
+            ))
+            return len(entries)
+
+        return await self.db.run_write(job)
+
+    async def get_history_stats(self) -> Dict[str, Any]:
+        """Umumiy hisoblagichlar va oxirgi yozuv (tarix hajmiga bog'liq emas)"""
+        async with self.db.acquire() as db:
+            cursor = await db.execute(
+                'SELECT total_broadcasts, total_messages, total_success FROM broadcast_stats WHERE id = 1'
+            )
+            row = await cursor.fetchone()
+            stats = dict(row) if row else {'total_broadcasts': 0, 'total_messages': 0, 'total_success': 0}
+
+            cursor = await db.execute('SELECT * FROM broadcast_history ORDER BY id DESC LIMIT 1')
+            last = await cursor.fetchone()
+            stats['last_broadcast'] = dict(last) if last else None
+            return stats
+
+    async def set_status(self, job_id: int, status: BroadcastStatus | str) -> bool:
+        """Holatni o'zgartirish; yakunlangan vazifalar o'zgarmaydi"""
+        status_value = status.value if isinstance(status, BroadcastStatus) else status
+        finished = status_value in (
+            BroadcastStatus.CANCELLED.value,
+            BroadcastStatus.COMPLETED.value,
+            BroadcastStatus.FAILED.value,
+        )
+        finished_at = ', finished_at = CURRENT_TIMESTAMP' if finished else ''
+        changed = await self.db.execute_write(f'''
+            UPDATE broadcast_jobs
+            SET status = ?, updated_at = CURRENT_TIMESTAMP{finished_at}
+            WHERE id = ? AND status IN ('running', 'paused')
+        ''', (status_value, job_id))
+        return changed > 0
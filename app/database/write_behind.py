@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Set, Tuple
+
+import aiosqlite
+
+from app.core.logging import get_logger
+from app.database.models import DatabaseManager
+
+logger = get_logger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Tez-tez bo'ladigan yozuvlarni xotirada yig'ib, davriy ravishda bitta
+    tranzaksiyada ``executemany`` bilan yozish
+
+    Foydalanuvchi faolligi (upsert + last_activity), konversiya log'lari va
+    ``total_conversions`` hisoblagichlari shu yerda birlashtiriladi.
+    """
+
+    def __init__(self, manager: DatabaseManager, flush_interval: float = 0.5, max_rows: int = 1000):
+        self.manager = manager
+        self.flush_interval = flush_interval
+        self.max_rows = max(1, max_rows)
+        self._users: Dict[int, Tuple[Any, ...]] = {}
+        self._conversions: List[Tuple[Any, ...]] = []
+        self._increments: Dict[int, int] = {}
+        # Hozir yozilayotgan (commit bo'lmagan) foydalanuvchilar
+        self._inflight_users: Set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending_rows(self) -> int:
+        return len(self._users) + len(self._conversions) + len(self._increments)
+
+    def has_pending_user(self, user_id: int) -> bool:
+        """Foydalanuvchi uchun hali yozilmagan o'zgarishlar bormi"""
+        return (
+            user_id in self._users
+            or user_id in self._increments
+            or user_id in self._inflight_users
+        )
+
+    def record_user(self, user_data: Dict[str, Any]) -> str:
+        """Foydalanuvchini yaratish/yangilash va last_activity'ni belgilash"""
+        user_id = user_data['user_id']
+        # CURRENT_TIMESTAMP bilan bir xil format (UTC)
+        last_activity = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._users[user_id] = (
+            user_id,
+            user_data.get('username'),
+            user_data.get('first_name'),
+            user_data.get('last_name'),
+            user_data.get('language_code', 'uz'),
+            last_activity,
+        )
+        self._maybe_wakeup()
+        return last_activity
+
+    def record_conversion(self, conversion_data: Dict[str, Any]):
+        """Konversiya log'ini navbatga qo'shish"""
+        self._conversions.append((
+            conversion_data['user_id'],
+            conversion_data.get('original_filename'),
+            conversion_data.get('file_size'),
+            conversion_data.get('audio_format'),
+            conversion_data.get('processing_time'),
+            conversion_data.get('success', True),
+            conversion_data.get('error_message'),
+            conversion_data.get('duration'),
+            conversion_data.get('codec'),
+            conversion_data.get('channels'),
+            conversion_data.get('encoder_profile'),
+        ))
+        self._maybe_wakeup()
+
+    def record_increment(self, user_id: int, amount: int = 1):
+        """Foydalanuvchi konversiyalar hisoblagichini oshirish"""
+        self._increments[user_id] = self._increments.get(user_id, 0) + amount
+        self._maybe_wakeup()
+
+    def _maybe_wakeup(self):
+        if self.pending_rows >= self.max_rows:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Davriy yozishni to'xtatish va qolgan hamma narsani yozish"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Yig'ilgan yozuvlarni bitta tranzaksiyada yozish"""
+        async with self._flush_lock:
+            if not self.pending_rows:
+                return
+
+            pending_users = self._users
+            conversions = self._conversions
+            pending_increments = self._increments
+            users = list(pending_users.values())
+            increments = [(amount, user_id) for user_id, amount in pending_increments.items()]
+            self._inflight_users = set(self._users) | set(self._increments)
+            self._users = {}
+            self._conversions = []
+            self._increments = {}
+
+            async def job(db: aiosqlite.Connection):
+                if users:
+                    await db.executemany('''
+                        INSERT INTO users
+                        (user_id, username, first_name, last_name, language_code, last_activity)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(user_id) DO UPDATE SET
+                            username = excluded.username,
+                            first_name = excluded.first_name,
+                            last_name = excluded.last_name,
+                            language_code = excluded.language_code,
+                            last_activity = excluded.last_activity
+                    ''', users)
+                if conversions:
+                    await db.executemany('''
+                        INSERT INTO audio_conversions
+                        (user_id, original_filename, file_size, audio_format, processing_time, success, error_message,
+                         duration, codec, channels, encoder_profile)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', conversions)
+                if increments:
+                    await db.executemany(
+                        'UPDATE users SET total_conversions = total_conversions + ? WHERE user_id = ?',
+                        increments
+                    )
+
+            try:
+                await self.manager.run_write(job)
+            except Exception as e:
+                logger.error(f"Write-behind buffer'ni yozishda xato, keyingi flush'da qayta yoziladi: {e}")
+                self._restore(pending_users, conversions, pending_increments)
+            finally:
+                self._inflight_users = set()
+
+    def _restore(
+        self,
+        users: Dict[int, Tuple[Any, ...]],
+        conversions: List[Tuple[Any, ...]],
+        increments: Dict[int, int],
+    ):
+        """Yozilmagan partiyani buferga qaytarish (flush paytida kelgan yangi yozuvlar ustun)"""
+        users.update(self._users)
+        self._users = users
+        self._conversions = conversions + self._conversions
+        for user_id, amount in self._increments.items():
+            increments[user_id] = increments.get(user_id, 0) + amount
+        self._increments = increments
@@ -6,14 +6,14 @@ from aiogram.fsm.state import State, StatesGroup
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import math
-import aiosqlite
-import shutil
 from pathlib import Path
 
 from app.core.config import config
 from app.core.logging import get_logger
+from app.core.metrics import CONVERSION_STAGES, CONVERSION_STAGE_SECONDS
 from app.database.database import get_database
 from app.services.broadcast_service import broadcast_service
+from app.services.audio_service import audio_service
 from app.utils.keyboards import AdminKeyboards
 from app.services.force_subscribe import force_subscribe_service
 from app.utils.messages import (
@@ -239,6 +239,7 @@ async def handle_stats_callbacks(callback: CallbackQuery, data: str):
         "stats_conversions": lambda: show_conversion_stats(callback, db),
         "stats_today": lambda: show_today_stats(callback, db),
         "stats_week": lambda: show_week_stats(callback, db),
+        "stats_cache": lambda: show_cache_stats(callback, db),
         "stats_channels": lambda: show_channels_stats(callback),
     }
     if data == "stats_refresh":
@@ -305,10 +306,23 @@ async def show_user_stats(callback: CallbackQuery, db):
         await callback.answer(MSG_STATS_ERROR, show_alert=True)
 
 
+def _format_duration(seconds: float) -> str:
+    """Soniyalarni "1 soat 5 daqiqa 3 soniya" ko'rinishiga keltirish"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours} soat {minutes} daqiqa"
+    if minutes:
+        return f"{minutes} daqiqa {secs} soniya"
+    return f"{secs} soniya"
+
+
 async def show_conversion_stats(callback: CallbackQuery, db):
     """Konversiya statistikasi"""
     try:
         conversions_today = await db.statistics.get_conversions_today()
+        processing = await db.statistics.get_processing_stats()
         
         text = f"""
 🎵 <b>Konversiya statistikasi</b>
@@ -316,6 +330,12 @@ async def show_conversion_stats(callback: CallbackQuery, db):
 📊 <b>Bugun:</b>
 • Konversiyalar: {conversions_today}
 • O'rtacha: {conversions_today/24:.1f} soatiga
+• Qayta ishlangan audio: {_format_duration(processing['audio_seconds_today'])}
+• Real-time factor: {processing['rtf_today']:.3f}
+
+📈 <b>Jami:</b>
+• Qayta ishlangan audio: {_format_duration(processing['audio_seconds'])}
+• Real-time factor: {processing['rtf']:.3f}
 
 📅 <b>Sana:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}
         """
@@ -365,7 +385,7 @@ async def show_week_stats(callback: CallbackQuery, db):
     try:
         today = datetime.now().date()
         week_ago = today - timedelta(days=7)
-        async with aiosqlite.connect(db.manager.db_path) as conn:
+        async with db.manager.acquire() as conn:
             cursor = await conn.execute(
                 '''
                 SELECT COUNT(DISTINCT user_id) FROM user_activity
@@ -395,6 +415,60 @@ async def show_week_stats(callback: CallbackQuery, db):
         await callback.answer(MSG_STATS_ERROR, show_alert=True)
 
 
+def _format_cache_stats(title: str, stats: Dict[str, Any]) -> str:
+    """Kesh statistikasini matnga aylantirish"""
+    if 'max_bytes' in stats:
+        size_line = (
+            f"• Hajm: {stats.get('size', 0)} ta, "
+            f"{stats['bytes'] / 1048576:.1f}/{stats['max_bytes'] / 1048576:.0f} MB\n"
+        )
+    else:
+        size_line = f"• Hajm: {stats.get('size', 0)}/{stats.get('maxsize', 0)}\n"
+    return (
+        f"<b>{title}:</b>\n"
+        + size_line +
+        f"• Hit: {stats.get('hits', 0)} | Miss: {stats.get('misses', 0)}\n"
+        f"• Hit rate: {stats.get('hit_rate', 0.0)}%\n"
+    )
+
+
+def _format_disk_cache_stats() -> str:
+    """Diskdagi Opus keshi statistikasi (o'chirilgan bo'lsa bo'sh)"""
+    output_cache = audio_service.processor.output_cache
+    if output_cache is None:
+        return ""
+    return "\n" + _format_cache_stats("💾 Disk keshi (Opus)", output_cache.stats())
+
+
+async def show_cache_stats(callback: CallbackQuery, db):
+    """Kesh statistikasi"""
+    try:
+        text = (
+            "⚡ <b>Kesh statistikasi</b>\n\n"
+            + _format_cache_stats("👤 Foydalanuvchilar keshi", db.users.cache.stats())
+            + "\n"
+            + _format_cache_stats(
+                "📢 Obuna holati keshi",
+                force_subscribe_service.membership_cache.stats()
+            )
+            + "\n"
+            + _format_cache_stats("🎙 Konversiya keshi", await db.conversion_cache.stats())
+            + _format_disk_cache_stats()
+            + "\n"
+            + _format_cache_stats("🔎 Probe keshi", audio_service.processor.probe_cache.stats())
+            + f"\n📅 <b>Sana:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+        )
+
+        await callback.message.edit_text(
+            text,
+            reply_markup=AdminKeyboards.stats_menu()
+        )
+
+    except Exception as e:
+        logger.error(f"Cache stats'da xato: {e}")
+        await callback.answer(MSG_STATS_ERROR, show_alert=True)
+
+
 # FOYDALANUVCHILAR HANDLERS
 async def handle_users_callbacks(callback: CallbackQuery, data: str, state: FSMContext):
     """Foydalanuvchilar callback'larini boshqarish"""
@@ -923,6 +997,9 @@ async def show_requests_stats(callback: CallbackQuery, db):
 
 
 # BROADCAST HANDLERS
+BROADCAST_JOB_ACTIONS = ("broadcast_pause_", "broadcast_resume_", "broadcast_cancel_")
+
+
 async def handle_broadcast_callbacks(callback: CallbackQuery, data: str, state: FSMContext):
     """Broadcast callback'larini boshqarish"""
     logger.info(f"Broadcast callback ishga tushdi: {data}")
@@ -938,10 +1015,38 @@ async def handle_broadcast_callbacks(callback: CallbackQuery, data: str, state:
     if action:
         logger.info(f"Broadcast action: {data}")
         await action()
+    elif data.startswith(BROADCAST_JOB_ACTIONS):
+        await handle_broadcast_job_action(callback, data)
     else:
         logger.warning(f"Noma'lum broadcast callback: {data}")
 
 
+async def handle_broadcast_job_action(callback: CallbackQuery, data: str):
+    """Broadcast vazifasini pauza qilish, davom ettirish yoki bekor qilish"""
+    action, _, job_id = data.rpartition("_")
+    if not job_id.isdigit():
+        logger.warning(f"Noto'g'ri broadcast vazifa ID: {data}")
+        return
+
+    job_id = int(job_id)
+    if action == "broadcast_pause":
+        done = await broadcast_service.pause_job(job_id)
+        notice = f"⏸ Broadcast #{job_id} pauzaga qo'yildi"
+    elif action == "broadcast_resume":
+        done = await broadcast_service.resume_job(callback.bot, job_id)
+        notice = f"▶️ Broadcast #{job_id} davom ettirildi"
+    else:
+        done = await broadcast_service.cancel_job(callback.bot, job_id)
+        notice = f"⛔ Broadcast #{job_id} bekor qilindi"
+
+    await callback.answer(notice if done else f"Broadcast #{job_id} allaqachon yakunlangan")
+    if broadcast_service.is_progress_message(job_id, callback.message.message_id):
+        # Jarayon xabari o'z joyida yangilanadi (bekor qilinganda yakuniy natija bilan)
+        await broadcast_service.refresh_progress(callback.bot, job_id)
+    else:
+        await show_broadcast_status(callback)
+
+
 async def start_broadcast_all(callback: CallbackQuery, state: FSMContext):
     """Barchaga xabar yuborishni boshlash"""
     await callback.message.edit_text(
@@ -1018,17 +1123,29 @@ async def show_broadcast_status(callback: CallbackQuery):
     """Broadcast holatini ko'rsatish"""
     try:
         stats = await broadcast_service.get_broadcast_stats()
+        active_jobs = await broadcast_service.get_active_jobs()
+
+        jobs_text = "".join(
+            f"{'⏸' if job['status'] == 'paused' else '▶️'} <b>#{job['id']}</b> ({job['target_type']}): "
+            f"{job['success_count'] + job['failed_count']}/{job['total_count']}, "
+            f"✅ {job['success_count']} 🚫 {job['failed_count']}\n"
+            for job in active_jobs
+        )
+        if jobs_text:
+            jobs_text = "🔄 <b>Faol broadcast'lar:</b>\n" + jobs_text + "\n"
 
         last = stats.get('last_broadcast')
         if not last:
             text = (
                 "📊 <b>Broadcast holati</b>\n\n"
+                + jobs_text +
                 "Hozircha broadcast yuborilmagan."
             )
         else:
             last_results = last.get('results', {})
             text = (
                 "📊 <b>Broadcast holati</b>\n\n"
+                + jobs_text +
                 f"📅 <b>Oxirgi yuborilgan:</b> {last.get('timestamp')}\n"
                 f"🎯 Maqsad: {last.get('target_type')}\n"
                 f"👥 Foydalanuvchilar: {last_results.get('total_count', 0)}\n"
@@ -1041,10 +1158,11 @@ async def show_broadcast_status(callback: CallbackQuery):
                 f"• Muvaffaqiyat darajasi: {stats.get('success_rate', 0.0)}%"
             )
 
-        await callback.message.edit_text(
-            text,
-            reply_markup=AdminKeyboards.broadcast_menu()
+        keyboard = (
+            AdminKeyboards.broadcast_jobs_menu(active_jobs)
+            if active_jobs else AdminKeyboards.broadcast_menu()
         )
+        await callback.message.edit_text(text, reply_markup=keyboard)
         
     except Exception as e:
         logger.error(f"Broadcast status'da xato: {e}")
@@ -1218,32 +1336,19 @@ async def handle_broadcast_message_input(message: Message, state: FSMContext):
         else:
             message_object = message
 
-        result = await broadcast_service.broadcast_message(
+        # Broadcast fonda ishlaydi - shu xabar jarayon davomida tahrirlanib boradi
+        progress_message = await message.answer("📡 <b>Broadcast tayyorlanmoqda...</b>")
+        job_id = await broadcast_service.start_broadcast(
             bot=message.bot,
+            admin_id=message.from_user.id,
+            target_type=target_type,
             message_text=message_text,
             message_object=message_object,
-            target_type=target_type,
-            admin_id=message.from_user.id
+            progress_message=progress_message
         )
 
-        if result.get('success'):
-            summary = (
-                "📡 <b>Broadcast yakunlandi</b>\n\n"
-                f"🎯 Maqsad: {target_type}\n"
-                f"👥 Jami foydalanuvchilar: {result.get('total_count', 0)}\n"
-                f"✅ Yetib borgan: {result.get('success_count', 0)}\n"
-                f"🚫 Xato: {result.get('failed_count', 0)}\n"
-                f"⛔ Bloklaganlar: {result.get('blocked_count', 0)}\n"
-                f"⏱ Vaqt: {result.get('duration', 0):.2f}s"
-            )
-        else:
-            failure_reason = result.get('message', "Noma'lum xato")
-            summary = (
-                "❌ Broadcast muvaffaqiyatsiz bo'ldi.\n"
-                f"Sabab: {failure_reason}"
-            )
-
-        await message.answer(summary)
+        if job_id is None:
+            await progress_message.edit_text("❌ Broadcast uchun foydalanuvchilar topilmadi.")
         await state.clear()
         
     except Exception as e:
@@ -1375,7 +1480,6 @@ async def backup_command_handler(message: Message):
         return
     
     try:
-        import shutil
         import os
         from datetime import datetime
         
@@ -1387,9 +1491,9 @@ async def backup_command_handler(message: Message):
         backup_filename = f"bot_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
         backup_path = backup_dir / backup_filename
         
-        # Ma'lumotlar bazasini backup qilish
+        # Ma'lumotlar bazasini backup qilish (WAL'dagi yozuvlar ham kiradi)
         if os.path.exists(config.DATABASE_URL):
-            shutil.copy2(config.DATABASE_URL, backup_path)
+            await get_database().manager.backup(str(backup_path))
             
             backup_text = f"""
 💾 <b>Ma'lumotlar bazasi backup</b>
@@ -1413,6 +1517,41 @@ async def backup_command_handler(message: Message):
         await message.answer(f"❌ Backup yaratishda xato: {str(e)}")
 
 
+def _format_stage_metrics() -> str:
+    """Konversiya bosqichlari bo'yicha p50/p95/p99 jadvali"""
+    lines = []
+    for stage in CONVERSION_STAGES:
+        snapshot = CONVERSION_STAGE_SECONDS.labels(stage=stage).snapshot()
+        if not snapshot['count']:
+            continue
+        lines.append(
+            f"• <b>{stage}</b> ({snapshot['count']}): "
+            f"{snapshot['p50']:.2f} / {snapshot['p95']:.2f} / {snapshot['p99']:.2f}s"
+        )
+    return "\n".join(lines) or "Hali ma'lumot yo'q"
+
+
+async def metrics_command_handler(message: Message):
+    """Metrics buyrug'i handler'i"""
+    logger.info(f"Metrics buyrug'i ishlatildi - User: {message.from_user.id}")
+    
+    if not is_admin(message.from_user.id):
+        await message.reply(MSG_NO_ADMIN_PERMISSION)
+        return
+    
+    try:
+        text = (
+            "⏱ <b>Konversiya bosqichlari</b> (p50 / p95 / p99)\n\n"
+            + _format_stage_metrics()
+            + f"\n\n📅 <b>Sana:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+        )
+        await message.answer(text)
+        
+    except Exception as e:
+        logger.error(f"Metrics buyrug'ida xato: {e}")
+        await message.answer(MSG_STATS_ERROR)
+
+
 def register_admin_handlers(dp: Dispatcher):
     """Admin handler'larini ro'yxatdan o'tkazish"""
     logger.info("Admin handler'lar ro'yxatdan o'tkazilmoqda...")
@@ -1426,6 +1565,7 @@ def register_admin_handlers(dp: Dispatcher):
     dp.message.register(channels_command_handler, Command("channels"))
     dp.message.register(broadcast_command_handler, Command("broadcast"))
     dp.message.register(backup_command_handler, Command("backup"))
+    dp.message.register(metrics_command_handler, Command("metrics"))
     
     logger.info("Admin /admin va qo'shimcha buyruqlar ro'yxatdan o'tkazildi")
     
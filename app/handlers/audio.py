@@ -1,12 +1,99 @@
+from typing import Optional
+
 from aiogram import Dispatcher, F
 from aiogram.types import Message, BufferedInputFile
-import aiofiles
+from aiogram.exceptions import TelegramBadRequest
 
 from app.core.logging import get_logger
+from app.core.metrics import CONVERSION_STAGE_SECONDS
 from app.services.audio_service import audio_service
 
 logger = get_logger(__name__)
 
+PROCESSING_TEXT = "🔄 Audio fayl qayta ishlanmoqda..."
+
+
+def _queue_notifier(processing_msg: Message):
+    """Processing xabarida navbatdagi o'rinni ko'rsatish"""
+    async def on_queued(position: int):
+        if position:
+            await processing_msg.edit_text(f"⏳ Siz navbatdasiz: {position}-o'rin. Iltimos, kuting...")
+        else:
+            await processing_msg.edit_text(PROCESSING_TEXT)
+    return on_queued
+
+
+async def _send_cached_voice(message: Message, file_unique_id: str, caption: str) -> bool:
+    """Keshdagi voice'ni qayta yuborish (yuklab olish va ffmpeg'siz)"""
+    voice_file_id = await audio_service.get_cached_voice(file_unique_id)
+    if not voice_file_id:
+        return False
+
+    try:
+        await message.reply_voice(voice=voice_file_id, caption=caption)
+        return True
+    except TelegramBadRequest as e:
+        # file_id eskirgan bo'lishi mumkin - qaytadan konvert qilinadi
+        logger.warning(f"Keshdagi voice yuborilmadi: {e}")
+        await audio_service.forget_voice(file_unique_id)
+        return False
+
+
+async def _convert_and_reply(
+    message: Message,
+    file_id: str,
+    file_unique_id: str,
+    filename: str,
+    caption: str,
+    duration: Optional[int] = None
+):
+    """Audio'ni voice'ga aylantirib javob berish"""
+    if await _send_cached_voice(message, file_unique_id, caption):
+        return
+
+    # Bot file ma'lumotlarini olish
+    with CONVERSION_STAGE_SECONDS.time(stage='get_file'):
+        telegram_file = await message.bot.get_file(file_id)
+
+    # Fayl tekshirish
+    is_valid, validation_message = audio_service.validate_audio_file(telegram_file)
+
+    if not is_valid:
+        await message.reply(validation_message)
+        return
+
+    # Processing xabari
+    processing_msg = await message.reply(PROCESSING_TEXT)
+
+    try:
+        # Audio faylni voice'ga aylantirish
+        success, result_message, voice_data, cacheable = await audio_service.convert_audio_to_voice(
+            message.bot, telegram_file, message.from_user.id, filename,
+            on_queued=_queue_notifier(processing_msg),
+            duration=duration,
+            file_unique_id=file_unique_id
+        )
+
+        if success and voice_data:
+            # Voice'ni to'g'ridan-to'g'ri xotiradan yuborish
+            voice_input = BufferedInputFile(voice_data, filename="voice.ogg")
+
+            with CONVERSION_STAGE_SECONDS.time(stage='upload'):
+                sent = await message.reply_voice(voice=voice_input, caption=caption)
+
+            await processing_msg.delete()
+
+            # Yuklama tufayli past sifatda olingan natija keshlanmaydi
+            if sent.voice and cacheable:
+                await audio_service.remember_voice(file_unique_id, sent.voice.file_id)
+
+        else:
+            await processing_msg.edit_text(result_message)
+
+    except Exception as e:
+        logger.error(f"Audio konversiyada xato: {e}")
+        await processing_msg.edit_text("❌ Audio faylni qayta ishlashda xato yuz berdi.")
+
 
 async def audio_document_handler(message: Message):
     """Audio document handler'i"""
@@ -16,47 +103,13 @@ async def audio_document_handler(message: Message):
         if not document:
             return
         
-        # Bot file ma'lumotlarini olish
-        telegram_file = await message.bot.get_file(document.file_id)
-        
-        # Fayl tekshirish
-        is_valid, validation_message = audio_service.validate_audio_file(
-            telegram_file, document.file_name
+        await _convert_and_reply(
+            message,
+            document.file_id,
+            document.file_unique_id,
+            document.file_name,
+            "✅ Audio muvaffaqiyatli voice message'ga aylantirildi!"
         )
-        
-        if not is_valid:
-            await message.reply(validation_message)
-            return
-        
-        # Processing xabari
-        processing_msg = await message.reply("🔄 Audio fayl qayta ishlanmoqda...")
-        
-        try:
-            # Audio faylni voice'ga aylantirish
-            success, result_message, voice_file_path = await audio_service.convert_audio_to_voice(
-                message.bot, telegram_file, message.from_user.id, document.file_name
-            )
-            
-            if success and voice_file_path:
-                # Voice faylni yuborish
-                async with aiofiles.open(voice_file_path, 'rb') as voice_file:
-                    voice_data = await voice_file.read()
-                
-                voice_input = BufferedInputFile(voice_data, filename="voice.ogg")
-                
-                await message.reply_voice(
-                    voice=voice_input,
-                    caption="✅ Audio muvaffaqiyatli voice message'ga aylantirildi!"
-                )
-                
-                await processing_msg.delete()
-                
-            else:
-                await processing_msg.edit_text(result_message)
-                
-        except Exception as e:
-            logger.error(f"Audio konversiyada xato: {e}")
-            await processing_msg.edit_text("❌ Audio faylni qayta ishlashda xato yuz berdi.")
             
     except Exception as e:
         logger.error(f"Audio handler'da xato: {e}")
@@ -71,54 +124,20 @@ async def audio_file_handler(message: Message):
         if not audio:
             return
         
-        # Bot file ma'lumotlarini olish
-        telegram_file = await message.bot.get_file(audio.file_id)
+        caption = "✅ Audio muvaffaqiyatli voice message'ga aylantirildi!"
+        if audio.title:
+            caption += f"\n🎵 {audio.title}"
+        if audio.performer:
+            caption += f"\n👤 {audio.performer}"
         
-        # Fayl tekshirish
-        is_valid, validation_message = audio_service.validate_audio_file(
-            telegram_file, f"{audio.performer or 'Audio'} - {audio.title or 'Unknown'}.mp3"
+        await _convert_and_reply(
+            message,
+            audio.file_id,
+            audio.file_unique_id,
+            f"{audio.performer or 'Audio'} - {audio.title or 'Unknown'}.mp3",
+            caption,
+            audio.duration
         )
-        
-        if not is_valid:
-            await message.reply(validation_message)
-            return
-        
-        # Processing xabari
-        processing_msg = await message.reply("🔄 Audio fayl qayta ishlanmoqda...")
-        
-        try:
-            # Audio faylni voice'ga aylantirish
-            success, result_message, voice_file_path = await audio_service.convert_audio_to_voice(
-                message.bot, telegram_file, message.from_user.id,
-                f"{audio.performer or 'Audio'} - {audio.title or 'Unknown'}.mp3"
-            )
-            
-            if success and voice_file_path:
-                # Voice faylni yuborish
-                async with aiofiles.open(voice_file_path, 'rb') as voice_file:
-                    voice_data = await voice_file.read()
-                
-                voice_input = BufferedInputFile(voice_data, filename="voice.ogg")
-                
-                caption = "✅ Audio muvaffaqiyatli voice message'ga aylantirildi!"
-                if audio.title:
-                    caption += f"\n🎵 {audio.title}"
-                if audio.performer:
-                    caption += f"\n👤 {audio.performer}"
-                
-                await message.reply_voice(
-                    voice=voice_input,
-                    caption=caption
-                )
-                
-                await processing_msg.delete()
-                
-            else:
-                await processing_msg.edit_text(result_message)
-                
-        except Exception as e:
-            logger.error(f"Audio konversiyada xato: {e}")
-            await processing_msg.edit_text("❌ Audio faylni qayta ishlashda xato yuz berdi.")
             
     except Exception as e:
         logger.error(f"Audio handler'da xato: {e}")
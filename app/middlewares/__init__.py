@@ -3,13 +3,18 @@ from aiogram import Dispatcher
 from .auth import AuthMiddleware  
 from .rate_limit import RateLimitMiddleware
 from .force_subscribe import ForceSubscribeMiddleware
+from .metrics import UpdateMetricsMiddleware, TimedMiddleware
 
 
 def register_all_middlewares(dp: Dispatcher):
     """Barcha middleware'larni ro'yxatdan o'tkazish"""
+    # Update'lar soni va umumiy vaqt - barcha middleware'lardan tashqarida
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
     # Middleware'lar tartib bo'yicha qo'shiladi
-    dp.message.middleware(AuthMiddleware())
-    dp.message.middleware(RateLimitMiddleware())
-    dp.message.middleware(ForceSubscribeMiddleware())
-    dp.callback_query.middleware(AuthMiddleware())
-    dp.callback_query.middleware(ForceSubscribeMiddleware())
\ No newline at end of file
+    # Auth bitta instansiya: "yaqinda ko'rilgan" to'plami message va callback uchun umumiy
+    auth_middleware = TimedMiddleware(AuthMiddleware())
+    dp.message.middleware(auth_middleware)
+    dp.message.middleware(TimedMiddleware(RateLimitMiddleware()))
+    dp.message.middleware(TimedMiddleware(ForceSubscribeMiddleware()))
+    dp.callback_query.middleware(auth_middleware)
+    dp.callback_query.middleware(TimedMiddleware(ForceSubscribeMiddleware()))
@@ -2,14 +2,36 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 
+from app.core.config import config
 from app.core.logging import get_logger
 from app.database.database import get_database
+from app.utils.cache import TTLCache
 
 logger = get_logger(__name__)
 
 
 class AuthMiddleware(BaseMiddleware):
     """Foydalanuvchi autentifikatsiya middleware'i"""
+
+    def __init__(self, activity_granularity: float = None):
+        # user_id -> profil fingerprint'i; muddati o'tgach last_activity qayta yoziladi
+        self._recently_seen = TTLCache(
+            config.USER_CACHE_SIZE,
+            config.USER_ACTIVITY_GRANULARITY if activity_granularity is None else activity_granularity
+        )
+        self.events_seen = 0
+        self.activity_writes = 0
+
+    def _fingerprint(self, user) -> int:
+        return hash((user.username, user.first_name, user.last_name, user.language_code))
+
+    def _should_record(self, user) -> bool:
+        """Profil o'zgargan yoki faollik vaqti eskirgan bo'lsa True"""
+        return self._recently_seen.get(user.id) != self._fingerprint(user)
+
+    def _mark_recorded(self, user):
+        """Yozuv muvaffaqiyatli navbatga qo'yilgandan keyin chaqiriladi"""
+        self._recently_seen.set(user.id, self._fingerprint(user))
     
     async def __call__(
         self,
@@ -33,11 +55,16 @@ class AuthMiddleware(BaseMiddleware):
                 'language_code': user.language_code
             }
             
-            await db.users.create_user(user_data)
-            await db.users.update_user_activity(user.id)
+            # Upsert va last_activity write-behind buffer orqali partiyalab yoziladi.
+            # Profil o'zgarmagan va yaqinda yozilgan bo'lsa, bazaga tegilmaydi.
+            self.events_seen += 1
+            if self._should_record(user):
+                self.activity_writes += 1
+                db.users.record_activity(user_data)
+                self._mark_recorded(user)
             
-            # Ma'lumotlarni data'ga qo'shish
-            data['user_data'] = await db.users.get_user(user.id)
+            # Ma'lumotlarni data'ga qo'shish (yangi foydalanuvchi hali yozilmagan bo'lishi mumkin)
+            data['user_data'] = await db.users.get_user(user.id) or user_data
             
             return await handler(event, data)
             
@@ -31,7 +31,10 @@ async def _handle_check_subscription_callback(
     if event.data != 'check_subscription':
         return False
 
-    is_subscribed, _ = await force_subscribe_service.check_user_subscriptions(bot, user_id)
+    # Tugma bosilganda kesh chetlab o'tiladi - foydalanuvchi hozirgina obuna bo'lgan bo'lishi mumkin
+    is_subscribed, _ = await force_subscribe_service.check_user_subscriptions(
+        bot, user_id, force_refresh=True
+    )
 
     if is_subscribed:
         await event.answer("✅ Barcha kanallarga obuna bo'lgansiz!", show_alert=True)
@@ -0,0 +1,56 @@
+import time
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.core.metrics import UPDATES_TOTAL, UPDATE_SECONDS, MIDDLEWARE_SECONDS
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Update'lar soni va to'liq qayta ishlash vaqti (tur bo'yicha)"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_type = event.event_type
+        UPDATES_TOTAL.inc(type=update_type)
+        with UPDATE_SECONDS.time(type=update_type):
+            return await handler(event, data)
+
+
+class TimedMiddleware(BaseMiddleware):
+    """
+    Boshqa middleware'ning o'z vaqtini o'lchash
+
+    Keyingi handler'da o'tgan vaqt ayirib tashlanadi - faqat middleware'ning
+    ishi (DB, obuna tekshiruvi va h.k.) qoladi.
+    """
+
+    def __init__(self, middleware: BaseMiddleware, name: str = None):
+        self.middleware = middleware
+        self.name = name or type(middleware).__name__
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        downstream = 0.0
+
+        async def timed_handler(event: TelegramObject, data: Dict[str, Any]) -> Any:
+            nonlocal downstream
+            started = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                downstream += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            MIDDLEWARE_SECONDS.observe(time.perf_counter() - started - downstream, middleware=self.name)
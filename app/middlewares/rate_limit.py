@@ -5,12 +5,28 @@ from aiogram.types import Message
 from app.core.config import config
 from app.core.logging import get_logger
 from app.database.database import get_database
+from app.services.rate_limiter import InMemoryRateLimiter
 
 logger = get_logger(__name__)
 
 
 class RateLimitMiddleware(BaseMiddleware):
     """Rate limiting middleware'i"""
+
+    def __init__(self, backend: str = None):
+        # "memory" - xotiradagi token bucket, "sqlite" - rate_limits jadvali (doimiy)
+        self.backend = (backend or config.RATE_LIMIT_BACKEND).lower()
+        self.limiter = InMemoryRateLimiter(config.RATE_LIMIT_MESSAGES, config.RATE_LIMIT_WINDOW)
+
+    async def _is_allowed(self, user_id: int) -> bool:
+        if self.backend == "sqlite":
+            db = get_database()
+            return await db.rate_limits.check_rate_limit(
+                user_id,
+                config.RATE_LIMIT_MESSAGES,
+                config.RATE_LIMIT_WINDOW
+            )
+        return self.limiter.check(user_id)
     
     async def __call__(
         self,
@@ -27,14 +43,8 @@ class RateLimitMiddleware(BaseMiddleware):
             if user.id == config.ADMIN_ID:
                 return await handler(event, data)
             
-            db = get_database()
-            
             # Rate limit tekshirish
-            is_allowed = await db.rate_limits.check_rate_limit(
-                user.id,
-                config.RATE_LIMIT_MESSAGES,
-                config.RATE_LIMIT_WINDOW
-            )
+            is_allowed = await self._is_allowed(user.id)
             
             if not is_allowed:
                 await event.answer(
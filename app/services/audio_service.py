@@ -1,8 +1,13 @@
 import os
 import time
 import asyncio
+import hashlib
+import json
 import subprocess
-from typing import Optional, Tuple, Dict, Any
+from collections import deque
+from typing import (
+    Optional, Tuple, Dict, Any, AsyncIterator, Awaitable, Callable, Deque, List, Union
+)
 from pathlib import Path
 import aiofiles
 from aiogram.types import File as TelegramFile
@@ -10,10 +15,68 @@ from aiogram import Bot
 
 from app.core.config import config
 from app.core.logging import get_logger
+from app.core.metrics import (
+    CONVERSION_STAGE_SECONDS, CONVERSION_QUEUE_DEPTH, CONVERSION_ACTIVE, register_cache_metrics
+)
 from app.database.database import get_database
+from app.utils.cache import TTLCache
+from app.utils.disk_cache import DiskLRUCache
 
 logger = get_logger(__name__)
 
+# moov atomi oxirida bo'lishi mumkin - ffmpeg'ga seek qilinadigan fayl kerak
+SEEKABLE_INPUT_FORMATS = {'m4a', 'mp4'}
+
+# Voice enkoder sozlamalari (barcha profillar uchun umumiy)
+VOICE_ENCODER = {
+    'codec': 'libopus',
+    'vbr': 'on',
+    'channels': 1,
+    'sample_rate': 48000,
+}
+
+# Enkoder profillari - qimmatdan arzonga tartiblangan
+ENCODER_PROFILES = {
+    'music': {'bitrate': 64000, 'application': 'audio', 'compression_level': 10},
+    'speech': {'bitrate': 32000, 'application': 'voip', 'compression_level': 10},
+    'speech_low': {'bitrate': 24000, 'application': 'voip', 'compression_level': 5},
+}
+PROFILE_ORDER = list(ENCODER_PROFILES)
+
+# Sozlamalar yoki profillar o'zgarsa konversiya keshi kaliti ham o'zgaradi
+VOICE_ENCODER_SETTINGS = ":".join(
+    [str(value) for value in VOICE_ENCODER.values()]
+    + [f"{name}={profile['bitrate']}/{profile['application']}" for name, profile in ENCODER_PROFILES.items()]
+)
+
+
+def build_transcode_plan(profile_name: str) -> Dict[str, Any]:
+    """To'liq transkod: har qanday kirish -> 48kHz mono Opus"""
+    profile = ENCODER_PROFILES[profile_name]
+    return {
+        'mode': 'transcode',
+        'profile': profile_name,
+        'args': [
+            '-ac', str(VOICE_ENCODER['channels']),  # Mono
+            '-ar', str(VOICE_ENCODER['sample_rate']),  # 48kHz sample rate
+            '-c:a', VOICE_ENCODER['codec'],  # Opus codec
+            '-b:a', str(profile['bitrate']),
+            '-vbr', VOICE_ENCODER['vbr'],  # Variable bitrate
+            '-application', profile['application'],
+            '-compression_level', str(profile['compression_level']),
+        ],
+    }
+
+
+TRANSCODE_PLAN = build_transcode_plan('music')
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Konteynerni aniqlash uchun kerakli boshlang'ich baytlar
+SNIFF_BYTES = 12
+# ffprobe'ga beriladigan boshlang'ich qism (kodek, kanallar va bitreyt uchun yetarli)
+PROBE_BYTES = 64 * 1024
+PROBE_TIMEOUT = 5  # soniya
+
 
 def get_ffmpeg_path():
     """FFmpeg binary path'ni olish"""
@@ -37,58 +100,346 @@ def get_ffprobe_path():
     return "ffprobe"
 
 
+def sniff_audio_format(head: bytes) -> Optional[str]:
+    """Faylning birinchi baytlari (magic number) bo'yicha audio formatini aniqlash"""
+    if head.startswith(b'ID3'):
+        return 'mp3'
+    if head.startswith(b'OggS'):
+        return 'ogg'
+    if head.startswith(b'fLaC'):
+        return 'flac'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm'
+    if head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[4:8] == b'ftyp':
+        return 'm4a'
+    if len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0:
+        # MPEG frame sync: layer bitlari 00 bo'lsa ADTS (AAC), aks holda MP3
+        return 'aac' if (head[1] & 0x06) == 0 else 'mp3'
+    return None
+
+
+def ogg_opus_duration(data: bytes) -> Optional[float]:
+    """Ogg/Opus davomiyligi: oxirgi sahifaning granule pozitsiyasi - pre-skip (48kHz)"""
+    last_page = data.rfind(b'OggS')
+    head = data.find(b'OpusHead')
+    if last_page < 0 or head < 0 or len(data) < last_page + 14 or len(data) < head + 12:
+        return None
+    granule = int.from_bytes(data[last_page + 6:last_page + 14], 'little')
+    pre_skip = int.from_bytes(data[head + 10:head + 12], 'little')
+    if granule <= pre_skip:
+        return None
+    return (granule - pre_skip) / 48000
+
+
+def plan_conversion(probe: Optional[Dict[str, Any]], profile_name: str = 'music') -> Dict[str, Any]:
+    """
+    ffprobe natijasi bo'yicha eng arzon konversiya usulini tanlash
+
+    Opus mono - qayta enkodlamasdan nusxalash, Opus stereo - nusxalash yoki
+    eng past murakkablikda mono'ga aylantirish, qolganlari - to'liq transkod.
+    """
+    if probe and probe.get('codec') == 'opus':
+        channels = probe.get('channels')
+        if channels == 1 or (channels == 2 and config.AUDIO_OPUS_STEREO_COPY):
+            return {'mode': 'copy', 'profile': 'copy', 'args': ['-c:a', 'copy']}
+        if channels == 2:
+            profile = ENCODER_PROFILES[profile_name]
+            return {
+                'mode': 'downmix',
+                'profile': profile_name,
+                'args': [
+                    '-ac', '1',
+                    '-c:a', VOICE_ENCODER['codec'],
+                    '-b:a', str(profile['bitrate']),
+                    '-application', profile['application'],
+                    '-compression_level', '0',  # Eng tez libopus rejimi
+                ],
+            }
+    return build_transcode_plan(profile_name)
+
+
+class StreamingInput:
+    """
+    Yuklanayotgan fayl: bo'laklarni bir marta o'qiydi, saqlaydi va hash'laydi
+
+    ``async for`` bo'laklarni kelishi bilan beradi; ``data`` va ``content_key``
+    yuklash tugagandan keyin ishlatiladi (fayl rejimi va disk keshi uchun).
+    """
+
+    def __init__(self, stream: AsyncIterator[bytes], max_size: int):
+        self._stream = stream
+        self.max_size = max_size
+        self.size = 0
+        self.head = b""
+        self._chunks: List[bytes] = []
+        self._delivered = 0
+        self._digest = hashlib.sha256(VOICE_ENCODER_SETTINGS.encode())
+        self.finished = False
+        # Tarmoqdan bo'lak kutishga ketgan umumiy vaqt (download bosqichi)
+        self.download_time = 0.0
+
+    @classmethod
+    async def open(cls, stream: AsyncIterator[bytes], max_size: int) -> "StreamingInput":
+        """Format aniqlash uchun yetarli baytlar kelguncha o'qish"""
+        source = cls(stream, max_size)
+        await source.prefetch(SNIFF_BYTES)
+        return source
+
+    async def _read_chunk(self):
+        started = time.perf_counter()
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self.finished = True
+            return
+        finally:
+            self.download_time += time.perf_counter() - started
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise ValueError(f"Fayl hajmi {self.max_size // (1024 * 1024)}MB dan oshdi")
+        self._chunks.append(chunk)
+        self._digest.update(chunk)
+
+    async def prefetch(self, min_bytes: int):
+        """Kamida ``min_bytes`` bayt yuklanguncha o'qish va ``head``ni yangilash"""
+        while not self.finished and self.size < min_bytes:
+            await self._read_chunk()
+        self.head = b"".join(self._chunks)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        while True:
+            if self._delivered < len(self._chunks):
+                self._delivered += 1
+                yield self._chunks[self._delivered - 1]
+            elif self.finished:
+                return
+            else:
+                await self._read_chunk()
+
+    async def read_all(self):
+        """Qolgan bo'laklarni yuklab olish"""
+        while not self.finished:
+            await self._read_chunk()
+
+    async def close(self):
+        await self._stream.aclose()
+
+    @property
+    def data(self) -> bytes:
+        return b"".join(self._chunks)
+
+    @property
+    def content_key(self) -> str:
+        """Kirish kontenti va enkoder sozlamalari bo'yicha kesh kaliti"""
+        return self._digest.hexdigest()
+
+
+class ConversionQueueFull(Exception):
+    """Konversiya navbati to'lgan"""
+
+
+class ConversionTicket:
+    """
+    Konversiya uchun joy
+
+    ``async with`` ichida ffmpeg ishlatish mumkin; chiqishda joy navbatdagi
+    kutayotgan so'rovga beriladi.
+    """
+
+    def __init__(self, scheduler: "ConversionScheduler", waiter: Optional[asyncio.Future] = None):
+        self._scheduler = scheduler
+        self._waiter = waiter
+        self._released = False
+
+    @property
+    def position(self) -> int:
+        """Navbatdagi o'rin (0 - ishlashga ruxsat berilgan)"""
+        if self._waiter is None or self._waiter.done():
+            return 0
+        return self._scheduler._position(self)
+
+    async def __aenter__(self) -> "ConversionTicket":
+        if self._waiter is not None and not self._waiter.done():
+            try:
+                await self._waiter
+            except asyncio.CancelledError:
+                self.cancel()
+                raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def release(self):
+        """Joyni bo'shatish (bir martadan ortiq chaqirilsa ta'sir qilmaydi)"""
+        if not self._released:
+            self._released = True
+            self._scheduler._release()
+
+    def cancel(self):
+        """``async with`` ga kirmasdan voz kechish: navbatdan chiqish yoki joyni bo'shatish"""
+        if self._waiter is None:
+            self.release()
+        elif not self._released:
+            self._released = True
+            self._scheduler._cancel(self)
+
+
+class ConversionScheduler:
+    """
+    Bir vaqtda ishlaydigan ffmpeg jarayonlarini cheklash
+
+    ``workers`` tadan ortiq konversiya FIFO navbatda kutadi, navbat
+    ``queue_size`` ga yetganda yangi so'rov darhol rad etiladi.
+    """
+
+    def __init__(self, workers: int = 0, queue_size: int = 50):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.queue_size = max(0, queue_size)
+        self._active = 0
+        self._waiters: Deque[ConversionTicket] = deque()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self) -> ConversionTicket:
+        """Joy olish; navbat to'la bo'lsa ConversionQueueFull"""
+        if self._active < self.workers and not self._waiters:
+            self._active += 1
+            return ConversionTicket(self)
+
+        if len(self._waiters) >= self.queue_size:
+            raise ConversionQueueFull()
+
+        ticket = ConversionTicket(self, asyncio.get_running_loop().create_future())
+        self._waiters.append(ticket)
+        return ticket
+
+    def try_acquire(self) -> Optional[ConversionTicket]:
+        """Bo'sh ishchi bo'lsa darhol joy olish, aks holda None (navbatga qo'shilmaydi)"""
+        if self._active < self.workers and not self._waiters:
+            self._active += 1
+            return ConversionTicket(self)
+        return None
+
+    def _position(self, ticket: ConversionTicket) -> int:
+        try:
+            return self._waiters.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def _release(self):
+        # Joy navbatdagi birinchi so'rovga to'g'ridan-to'g'ri o'tkaziladi
+        while self._waiters:
+            ticket = self._waiters.popleft()
+            if not ticket._waiter.done():
+                ticket._waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _cancel(self, ticket: ConversionTicket):
+        if ticket._waiter.done() and not ticket._waiter.cancelled():
+            # Joy berilgan, lekin ishlatilmadi - keyingisiga o'tkaziladi
+            self._release()
+        else:
+            try:
+                self._waiters.remove(ticket)
+            except ValueError:
+                pass
+
+
 class AudioProcessor:
     """Audio fayllarni qayta ishlash uchun sinf"""
     
-    def __init__(self):
+    def __init__(self, scheduler: Optional[ConversionScheduler] = None):
+        self.scheduler = scheduler
         self.temp_dir = Path(config.TEMP_AUDIO_DIR)
         self.temp_dir.mkdir(parents=True, exist_ok=True)
         self.supported_formats = [fmt.lower().strip() for fmt in config.SUPPORTED_AUDIO_FORMATS]
         self.max_size = config.MAX_AUDIO_SIZE
+        self.pipe_mode = config.AUDIO_PIPE_MODE
+        # ffprobe natijalari file_unique_id bo'yicha - bir xil fayl qayta tekshirilmaydi
+        self.probe_cache = TTLCache(config.PROBE_CACHE_SIZE, config.PROBE_CACHE_TTL)
+        register_cache_metrics('probe', self.probe_cache)
+        self._sweep_stale_files()
+        # Tayyor Opus natijalar keshi (kirish kontentining hash'i bo'yicha)
+        self.output_cache: Optional[DiskLRUCache] = None
+        if config.AUDIO_CACHE_MAX_BYTES > 0:
+            self.output_cache = DiskLRUCache(
+                str(self.temp_dir / "cache"),
+                config.AUDIO_CACHE_MAX_BYTES
+            )
+            register_cache_metrics('disk', self.output_cache)
     
     async def process_audio_file(
         self, 
         bot: Bot, 
         telegram_file: TelegramFile, 
         user_id: int,
-        original_filename: str = None
-    ) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+        original_filename: str = None,
+        duration: Optional[float] = None,
+        file_unique_id: Optional[str] = None
+    ) -> Tuple[bool, Optional[Union[bytes, str]], Optional[Dict[str, Any]]]:
         """
         Audio faylni qayta ishlash
+
+        ``duration`` - Telegram bergan davomiylik (ma'lum bo'lsa), profil tanlash uchun;
+        ``file_unique_id`` - probe natijasini keshlash kaliti
         
         Returns:
-            Tuple[success, file_path_or_error, metadata]
+            Tuple[success, voice_bytes_or_error, metadata]
         """
         start_time = time.time()
-        temp_input_path = None
-        temp_output_path = None
+        source = None
         
         try:
             # Fayl o'lchamini tekshirish
             if telegram_file.file_size > self.max_size:
                 return False, f"Fayl hajmi juda katta. Maksimal: {self.max_size // (1024*1024)}MB", None
             
-            # Fayl formatini tekshirish
-            file_extension = self._get_file_extension(telegram_file.file_path or original_filename)
-            if not self._is_supported_format(file_extension):
-                return False, f"Qo'llab-quvvatlanmaydigan format. Qo'llab-quvvatlanadigan: {', '.join(self.supported_formats)}", None
-            
-            # Faylni yuklab olish
-            temp_input_path = self.temp_dir / f"input_{user_id}_{int(time.time())}.{file_extension}"
-            await bot.download_file(telegram_file.file_path, temp_input_path)
+            # Yuklab olishni boshlash va formatni birinchi baytlar bo'yicha aniqlash
+            source = await StreamingInput.open(
+                self._iter_download(bot, telegram_file.file_path),
+                self.max_size
+            )
+            file_extension = sniff_audio_format(source.head)
+            if file_extension is None or not self._is_supported_format(file_extension):
+                logger.info(f"Fayl rad etildi: audio formati aniqlanmadi ({original_filename})")
+                return False, f"Fayl audio emas yoki formati qo'llab-quvvatlanmaydi. Qo'llab-quvvatlanadigan: {', '.join(self.supported_formats)}", None
             
-            logger.info(f"Fayl yuklandi: {temp_input_path}")
+            # Probe: kodek, kanallar, bitreyt (file_unique_id bo'yicha keshlanadi)
+            probe = await self._probe(source, file_extension, file_unique_id)
+            if not duration and probe and probe.get('bit_rate'):
+                # Davomiylikni fayl hajmi va bitreytdan taxmin qilish
+                duration = telegram_file.file_size * 8 / probe['bit_rate']
+
+            # Opus kirishlar uchun qayta enkodlamaslik mumkin, qolganlariga profil tanlanadi
+            plan = plan_conversion(probe, self._select_profile(duration))
+            logger.info(f"Konversiya rejasi: {plan['mode']} ({plan['profile']}), davomiylik: {duration}")
             
             # Audio faylni OGG formatiga o'tkazish (Telegram voice uchun)
-            temp_output_path = self.temp_dir / f"output_{user_id}_{int(time.time())}.ogg"
-
-            success, error_msg = await self._convert_to_voice(
-                str(temp_input_path),
-                str(temp_output_path),
-            )
+            if (
+                self.pipe_mode
+                and file_extension not in SEEKABLE_INPUT_FORMATS
+                and not self._should_chunk(plan, duration)
+            ):
+                voice_data, error_msg = await self._convert_streaming(source, user_id, file_extension, plan)
+            else:
+                voice_data, error_msg = await self._convert_buffered(
+                    source, user_id, file_extension, plan, duration
+                )
 
-            if not success:
-                self._cleanup_temp_files([temp_output_path])
+            if voice_data is None:
                 return False, error_msg, None
             
             # Metadata yaratish
@@ -99,17 +450,24 @@ class AudioProcessor:
                 'file_size': telegram_file.file_size,
                 'audio_format': file_extension,
                 'processing_time': processing_time,
-                'success': True
+                'success': True,
+                # Aniq davomiylik natijaning o'zidan, bo'lmasa taxminiy qiymat
+                'duration': ogg_opus_duration(voice_data) or duration,
+                'codec': probe.get('codec') if probe else None,
+                'channels': probe.get('channels') if probe else None,
+                'encoder_profile': plan['profile'],
             }
             
-            # Ma'lumotlar bazasiga yozish
-            db = get_database()
-            await db.conversions.log_conversion(metadata)
-            await db.users.increment_conversions(user_id)
+            # Ma'lumotlar bazasiga yozish (log + hisoblagich bitta partiyada)
+            with CONVERSION_STAGE_SECONDS.time(stage='db'):
+                db = get_database()
+                db.conversions.record_conversion(metadata)
+                await db.users.increment_conversions(user_id)
+            CONVERSION_STAGE_SECONDS.observe(processing_time, stage='total')
             
             logger.info(f"Audio muvaffaqiyatli qayta ishlandi. Vaqt: {processing_time:.2f}s")
             
-            return True, str(temp_output_path), metadata
+            return True, voice_data, metadata
             
         except Exception as e:
             error_msg = f"Audio qayta ishlashda xato: {str(e)}"
@@ -118,7 +476,7 @@ class AudioProcessor:
             # Xatolikni ma'lumotlar bazasiga yozish
             try:
                 db = get_database()
-                await db.conversions.log_conversion({
+                db.conversions.record_conversion({
                     'user_id': user_id,
                     'original_filename': original_filename,
                     'file_size': telegram_file.file_size if telegram_file else 0,
@@ -130,32 +488,447 @@ class AudioProcessor:
             except Exception as db_error:
                 logger.error(f"Ma'lumotlar bazasiga xato yozishda muammo: {db_error}")
 
-            self._cleanup_temp_files([temp_output_path])
             return False, error_msg, None
 
         finally:
-            # Foydalanuvchi yuborib bo'lgandan so'ng chiqish fayli o'chiriladi
-            self._cleanup_temp_files([temp_input_path])
-    
-    async def _convert_to_voice(self, input_path: str, output_path: str) -> Tuple[bool, Optional[str]]:
-        """Audio faylni voice formatiga o'tkazish FFmpeg orqali"""
+            # Rad etilgan yoki xato bo'lgan holatda qolgan yuklashni to'xtatish
+            if source is not None:
+                if source.finished:
+                    CONVERSION_STAGE_SECONDS.observe(source.download_time, stage='download')
+                await source.close()
+
+    async def _iter_download(self, bot: Bot, file_path: str) -> AsyncIterator[bytes]:
+        """Telegram'dan faylni bo'laklab yuklab olish"""
+        api = bot.session.api
+        if api.is_local:
+            async with aiofiles.open(api.wrap_local_file.to_local(file_path), 'rb') as f:
+                while True:
+                    chunk = await f.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+        else:
+            stream = bot.session.stream_content(
+                url=api.file_url(bot.token, file_path),
+                chunk_size=DOWNLOAD_CHUNK_SIZE,
+                raise_for_status=True,
+            )
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+
+    async def _get_cached_output(self, cache_key: str) -> Optional[bytes]:
+        if self.output_cache is None:
+            return None
         try:
-            # FFmpeg buyrug'i
-            cmd = [
+            voice_data = await self.output_cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Disk keshini o'qishda xato: {e}")
+            return None
+        if voice_data is not None:
+            logger.info(f"Natija disk keshidan olindi: {cache_key[:12]}")
+        return voice_data
+
+    async def _store_output(self, cache_key: str, voice_data: bytes):
+        if self.output_cache is None:
+            return
+        try:
+            await self.output_cache.put(cache_key, voice_data)
+        except Exception as e:
+            logger.warning(f"Disk keshiga yozishda xato: {e}")
+
+    async def _convert_streaming(
+        self,
+        source: StreamingInput,
+        user_id: int,
+        file_extension: str,
+        plan: Dict[str, Any] = TRANSCODE_PLAN
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Yuklanayotgan bo'laklarni darhol ffmpeg stdin'iga berish
+
+        Tarmoq va enkodlash bir vaqtda ketadi. Yuklash tugagach kontent hash'i
+        bo'yicha disk keshi tekshiriladi - hit bo'lsa ffmpeg to'xtatiladi.
+        """
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._build_ffmpeg_command('pipe:0', 'pipe:1', plan),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            error_msg = "FFmpeg o'rnatilmagan yoki PATH'da yo'q"
+            logger.error(error_msg)
+            return None, error_msg
+
+        encode_started = time.perf_counter()
+        stdout_task = asyncio.create_task(process.stdout.read())
+        stderr_task = asyncio.create_task(process.stderr.read())
+        try:
+            try:
+                async for chunk in source:
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg erta to'xtadi - fayl rejimida qayta urinish uchun yuklashni tugatish
+                await source.read_all()
+
+            voice_data = await self._get_cached_output(self._output_key(source, plan))
+            if voice_data is not None:
+                return voice_data, None
+
+            stdout = await stdout_task
+            stderr = await stderr_task
+            await process.wait()
+            # Pipe rejimida enkodlash yuklash bilan ustma-ust ketadi
+            CONVERSION_STAGE_SECONDS.observe(time.perf_counter() - encode_started, stage='encode')
+
+            if process.returncode == 0 and stdout:
+                logger.debug(f"Audio pipe orqali konvert qilindi: {len(stdout)} bayt")
+                await self._store_output(self._output_key(source, plan), stdout)
+                return stdout, None
+
+            logger.error(f"FFmpeg xatosi: {stderr.decode('utf-8', errors='ignore')}")
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            stdout_task.cancel()
+            stderr_task.cancel()
+
+        # Masalan, boshqa konteyner noto'g'ri kengaytma bilan kelgan - fayl orqali qayta urinish
+        logger.warning("Pipe rejimida konversiya bo'lmadi, fayl rejimiga o'tilmoqda")
+        # Nusxalash rejasi ham muvaffaqiyatsiz bo'lishi mumkin - fallback doim to'liq transkod
+        if plan['mode'] != 'transcode':
+            plan = build_transcode_plan(self._select_profile(None))
+        voice_data, error_msg = await self._convert_via_files(source.data, user_id, file_extension, plan)
+        if voice_data is not None:
+            await self._store_output(self._output_key(source, plan), voice_data)
+        return voice_data, error_msg
+
+    async def _convert_buffered(
+        self,
+        source: StreamingInput,
+        user_id: int,
+        file_extension: str,
+        plan: Dict[str, Any],
+        duration: Optional[float] = None
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """To'liq yuklab olib, fayllar orqali (uzun audio bo'lsa bo'laklab) konversiya"""
+        await source.read_all()
+        output_key = self._output_key(source, plan)
+        voice_data = await self._get_cached_output(output_key)
+        if voice_data is not None:
+            return voice_data, None
+
+        if self._should_chunk(plan, duration):
+            voice_data, error_msg = await self._convert_chunked(
+                source.data, user_id, file_extension, plan, duration
+            )
+        else:
+            voice_data, error_msg = await self._convert_via_files(
+                source.data, user_id, file_extension, plan
+            )
+
+        if voice_data is not None:
+            await self._store_output(output_key, voice_data)
+        return voice_data, error_msg
+
+    def _should_chunk(self, plan: Dict[str, Any], duration: Optional[float]) -> bool:
+        """Uzun audio'ni bo'laklarga bo'lib parallel enkodlash kerakmi"""
+        return (
+            config.AUDIO_CHUNKED_MIN_DURATION > 0
+            and plan['mode'] != 'copy'
+            and bool(duration)
+            and duration >= config.AUDIO_CHUNKED_MIN_DURATION
+            and duration >= 2 * config.AUDIO_CHUNK_SECONDS
+        )
+
+    def _borrow_workers(self, limit: int) -> List[ConversionTicket]:
+        """Scheduler'dan bo'sh turgan ishchilarni vaqtincha olish"""
+        tickets = []
+        while self.scheduler is not None and len(tickets) < limit:
+            ticket = self.scheduler.try_acquire()
+            if ticket is None:
+                break
+            tickets.append(ticket)
+        return tickets
+
+    async def _convert_chunked(
+        self,
+        input_data: bytes,
+        user_id: int,
+        file_extension: str,
+        plan: Dict[str, Any],
+        duration: float
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Uzun audio'ni vaqt bo'laklariga bo'lib parallel enkodlash
+
+        Bo'laklar ``-ss/-t`` bilan alohida Ogg/Opus qilib enkodlanadi va concat
+        demuxer orqali ``-c copy`` bilan birlashtiriladi. Parallellik uchun
+        scheduler'dagi bo'sh ishchilar olinadi - umumiy ffmpeg chegarasi buzilmaydi.
+        """
+        chunk_seconds = config.AUDIO_CHUNK_SECONDS
+        # Oxirgi bo'lak oxirigacha boradi - davomiylik taxminiy bo'lsa ham hech narsa yo'qolmaydi
+        segment_count = max(1, int(duration // chunk_seconds))
+        parallelism = min(segment_count, config.AUDIO_CHUNK_PARALLELISM or segment_count)
+        helpers = self._borrow_workers(parallelism - 1)
+        if not helpers:
+            # Bo'sh ishchi yo'q - bo'laklashdan foyda yo'q
+            return await self._convert_via_files(input_data, user_id, file_extension, plan)
+
+        stamp = time.time_ns()
+        temp_input_path = self.temp_dir / f"input_{user_id}_{stamp}.{file_extension}"
+        segment_paths = [
+            self.temp_dir / f"output_{user_id}_{stamp}_{index}.ogg"
+            for index in range(segment_count)
+        ]
+        list_path = self.temp_dir / f"output_{user_id}_{stamp}.txt"
+        temp_output_path = self.temp_dir / f"output_{user_id}_{stamp}.ogg"
+        semaphore = asyncio.Semaphore(len(helpers) + 1)
+
+        async def encode_segment(index: int) -> Tuple[bool, Optional[str]]:
+            async with semaphore:
+                return await self._run_ffmpeg(self._build_ffmpeg_command(
+                    str(temp_input_path),
+                    str(segment_paths[index]),
+                    plan,
+                    start=index * chunk_seconds,
+                    length=chunk_seconds if index < segment_count - 1 else None,
+                ))
+
+        try:
+            async with aiofiles.open(temp_input_path, 'wb') as input_file:
+                await input_file.write(input_data)
+
+            logger.info(
+                f"Uzun audio {segment_count} bo'lakda, {len(helpers) + 1} ta parallel enkodlanmoqda"
+            )
+            encode_started = time.perf_counter()
+            results = await asyncio.gather(*(encode_segment(i) for i in range(segment_count)))
+            for helper in helpers:
+                helper.release()
+
+            failed = next((error for success, error in results if not success), None)
+            if failed is not None:
+                logger.warning("Bo'laklab enkodlash muvaffaqiyatsiz, oddiy rejimga o'tilmoqda")
+                return await self._convert_via_files(input_data, user_id, file_extension, plan)
+
+            async with aiofiles.open(list_path, 'w') as list_file:
+                await list_file.write("".join(f"file '{path.absolute()}'\n" for path in segment_paths))
+
+            success, error_msg = await self._run_ffmpeg([
                 get_ffmpeg_path(),
-                '-i', input_path,
-                '-vn',
-                '-ac', '1',  # Mono
-                '-ar', '48000',  # 48kHz sample rate
-                '-c:a', 'libopus',  # Opus codec
-                '-b:a', '64k',  # 64kbps bitrate
-                '-vbr', 'on',  # Variable bitrate
-                '-map_metadata', '-1',
+                '-f', 'concat',
+                '-safe', '0',
+                '-i', str(list_path),
+                '-c', 'copy',
                 '-f', 'ogg',
-                '-y',  # Overwrite output file
-                output_path
-            ]
-            
+                '-y',
+                str(temp_output_path),
+            ])
+            if not success:
+                logger.warning(f"Bo'laklarni birlashtirish muvaffaqiyatsiz, oddiy rejimga o'tilmoqda: {error_msg}")
+                return await self._convert_via_files(input_data, user_id, file_extension, plan)
+            CONVERSION_STAGE_SECONDS.observe(time.perf_counter() - encode_started, stage='encode')
+
+            return await self._read_output(temp_output_path), None
+
+        finally:
+            for helper in helpers:
+                helper.release()
+            self._cleanup_temp_files([temp_input_path, list_path, temp_output_path, *segment_paths])
+
+    async def _convert_via_files(
+        self,
+        input_data: bytes,
+        user_id: int,
+        file_extension: str,
+        plan: Dict[str, Any] = TRANSCODE_PLAN
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """Vaqtinchalik fayllar orqali konversiya (seek talab qiladigan formatlar uchun)"""
+        stamp = time.time_ns()
+        temp_input_path = self.temp_dir / f"input_{user_id}_{stamp}.{file_extension}"
+        temp_output_path = self.temp_dir / f"output_{user_id}_{stamp}.ogg"
+
+        try:
+            async with aiofiles.open(temp_input_path, 'wb') as input_file:
+                await input_file.write(input_data)
+
+            with CONVERSION_STAGE_SECONDS.time(stage='encode'):
+                success, error_msg = await self._convert_to_voice(
+                    str(temp_input_path),
+                    str(temp_output_path),
+                    plan,
+                )
+            if not success:
+                return None, error_msg
+
+            return await self._read_output(temp_output_path), None
+
+        finally:
+            self._cleanup_temp_files([temp_input_path, temp_output_path])
+
+    async def _read_output(self, output_path: Path) -> bytes:
+        """Tayyor natijani diskdan o'qish (read_back bosqichi)"""
+        with CONVERSION_STAGE_SECONDS.time(stage='read_back'):
+            async with aiofiles.open(output_path, 'rb') as voice_file:
+                return await voice_file.read()
+
+    def _build_ffmpeg_command(
+        self,
+        input_spec: str,
+        output_spec: str,
+        plan: Dict[str, Any] = TRANSCODE_PLAN,
+        start: Optional[float] = None,
+        length: Optional[float] = None
+    ) -> List[str]:
+        """Voice (OGG/Opus) uchun FFmpeg buyrug'i (ixtiyoriy ravishda vaqt bo'lagi uchun)"""
+        segment = []
+        if start:
+            segment += ['-ss', str(start)]
+        if length:
+            segment += ['-t', str(length)]
+        return [
+            get_ffmpeg_path(),
+            *segment,
+            '-i', input_spec,
+            '-vn',
+            *plan['args'],
+            '-map_metadata', '-1',
+            '-f', 'ogg',
+            '-y',  # Overwrite output file
+            output_spec
+        ]
+
+    async def _probe_head(self, head: bytes) -> Optional[Dict[str, Any]]:
+        """Faylning boshlang'ich qismini ffprobe'ga stdin orqali berib, audio stream'ni aniqlash"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                get_ffprobe_path(),
+                '-v', 'quiet',
+                '-print_format', 'json',
+                '-show_streams',
+                '-show_format',
+                '-select_streams', 'a:0',
+                '-i', 'pipe:0',
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                stdout, _ = await asyncio.wait_for(process.communicate(head), timeout=PROBE_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                logger.warning("ffprobe vaqti tugadi")
+                return None
+
+            probe_data = json.loads(stdout.decode('utf-8') or '{}')
+            streams = probe_data.get('streams') or []
+            if not streams:
+                return None
+            return {
+                'codec': streams[0].get('codec_name'),
+                'channels': int(streams[0].get('channels') or 0),
+                'sample_rate': int(streams[0].get('sample_rate') or 0),
+                # Qisman kirishda format davomiyligi noto'g'ri, bitreyt esa ishonchli
+                'bit_rate': int(
+                    streams[0].get('bit_rate') or probe_data.get('format', {}).get('bit_rate') or 0
+                ),
+            }
+        except Exception as e:
+            logger.warning(f"ffprobe bilan tekshirishda xato: {e}")
+            return None
+
+    async def _probe(
+        self,
+        source: StreamingInput,
+        file_extension: str,
+        file_unique_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Probe bosqichi: har bir kirish uchun bir marta"""
+        if file_unique_id:
+            cached = self.probe_cache.get(file_unique_id)
+            if cached is not None:
+                return cached
+
+        # moov oxirida bo'lsa boshlang'ich qismdan hech narsa aniqlanmaydi
+        if file_extension in SEEKABLE_INPUT_FORMATS:
+            return None
+
+        await source.prefetch(PROBE_BYTES)
+        with CONVERSION_STAGE_SECONDS.time(stage='probe'):
+            probe = await self._probe_head(source.head)
+        if probe is not None and file_unique_id:
+            self.probe_cache.set(file_unique_id, probe)
+        return probe
+
+    def _queue_pressure(self) -> float:
+        """Navbatdagi so'rovlar soni / ishchilar soni"""
+        if self.scheduler is None:
+            return 0.0
+        return self.scheduler.queued / self.scheduler.workers
+
+    def _select_profile(self, duration: Optional[float], under_load: bool = True) -> str:
+        """
+        Enkoder profilini tanlash
+
+        Yuklama yuqori bo'lsa yoki fayl uzun bo'lsa arzonroq profil olinadi,
+        ikkalasi birga bo'lsa eng arzoni. So'ng natija hajmi maqsaddan
+        oshmaguncha profil pasaytiriladi. ``under_load=False`` - yuklamani
+        hisobga olmasdan (fayl uchun to'liq sifat).
+        """
+        default = config.AUDIO_DEFAULT_PROFILE
+        level = PROFILE_ORDER.index(default) if default in ENCODER_PROFILES else 0
+        if under_load and self._queue_pressure() >= config.AUDIO_HIGH_LOAD_RATIO:
+            level += 1
+        if duration and duration >= config.AUDIO_LONG_DURATION:
+            level += 1
+        level = min(level, len(PROFILE_ORDER) - 1)
+
+        if duration and config.AUDIO_TARGET_OUTPUT_SIZE > 0:
+            while (
+                level < len(PROFILE_ORDER) - 1
+                and ENCODER_PROFILES[PROFILE_ORDER[level]]['bitrate'] * duration / 8 > config.AUDIO_TARGET_OUTPUT_SIZE
+            ):
+                level += 1
+
+        return PROFILE_ORDER[level]
+
+    def is_full_quality(self, profile: str, duration: Optional[float]) -> bool:
+        """Natija yuklama tufayli pasaytirilmagan profilda olinganmi (keshlash mumkin)"""
+        if profile not in ENCODER_PROFILES:
+            # copy - kirishning o'zi
+            return True
+        return PROFILE_ORDER.index(profile) <= PROFILE_ORDER.index(self._select_profile(duration, under_load=False))
+
+    def _output_key(self, source: StreamingInput, plan: Dict[str, Any]) -> str:
+        """Disk keshi kaliti: reja profili + kirish kontenti hash'i"""
+        return f"{plan['profile']}-{source.content_key}"
+    
+    async def _convert_to_voice(
+        self,
+        input_path: str,
+        output_path: str,
+        plan: Dict[str, Any] = TRANSCODE_PLAN
+    ) -> Tuple[bool, Optional[str]]:
+        """Audio faylni voice formatiga o'tkazish FFmpeg orqali"""
+        success, error_msg = await self._run_ffmpeg(
+            self._build_ffmpeg_command(input_path, output_path, plan)
+        )
+        if success:
+            logger.debug(f"Audio muvaffaqiyatli konvert qilindi: {output_path}")
+        return success, error_msg
+
+    async def _run_ffmpeg(self, cmd: List[str]) -> Tuple[bool, Optional[str]]:
+        """FFmpeg buyrug'ini bajarish"""
+        try:
             # FFmpeg'ni async ravishda ishga tushirish
             process = await asyncio.create_subprocess_exec(
                 *cmd,
@@ -166,7 +939,6 @@ class AudioProcessor:
             _, stderr = await process.communicate()
             
             if process.returncode == 0:
-                logger.debug(f"Audio muvaffaqiyatli konvert qilindi: {output_path}")
                 return True, None
             else:
                 error_msg = f"FFmpeg xatosi: {stderr.decode('utf-8', errors='ignore')}"
@@ -202,28 +974,26 @@ class AudioProcessor:
                 except Exception as e:
                     logger.warning(f"Vaqtinchalik faylni o'chirishda xato: {e}")
 
-    def cleanup_old_temp_files(self, max_age_hours: int = 1):
-        """Eski vaqtinchalik fayllarni tozalash"""
-        try:
-            current_time = time.time()
-            max_age_seconds = max_age_hours * 3600
-
-            for file_path in self.temp_dir.glob("*"):
-                if file_path.is_file():
-                    file_age = current_time - file_path.stat().st_mtime
-                    if file_age > max_age_seconds:
+    def _sweep_stale_files(self):
+        """Oldingi ishga tushirishdan qolib ketgan vaqtinchalik fayllarni o'chirish"""
+        for pattern in ("input_*", "output_*"):
+            for file_path in self.temp_dir.glob(pattern):
+                try:
+                    if file_path.is_file():
                         file_path.unlink()
                         logger.debug(f"Eski vaqtinchalik fayl o'chirildi: {file_path}")
-
-        except Exception as e:
-            logger.error(f"Eski fayllarni tozalashda xato: {e}")
+                except Exception as e:
+                    logger.warning(f"Eski faylni o'chirishda xato: {e}")
 
 
 class AudioService:
     """Audio xizmat sinfi"""
 
     def __init__(self):
-        self.processor = AudioProcessor()
+        self.scheduler = ConversionScheduler(config.CONVERSION_WORKERS, config.CONVERSION_QUEUE_SIZE)
+        self.processor = AudioProcessor(self.scheduler)
+        CONVERSION_QUEUE_DEPTH.set_function(lambda: self.scheduler.queued)
+        CONVERSION_ACTIVE.set_function(lambda: self.scheduler.active)
 
     async def convert_audio_to_voice(
         self,
@@ -231,25 +1001,83 @@ class AudioService:
         telegram_file: TelegramFile,
         user_id: int,
         original_filename: str = None,
-    ) -> Tuple[bool, str, Optional[str]]:
-        """Audio faylni voice message'ga o'tkazish"""
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+        duration: Optional[float] = None,
+        file_unique_id: Optional[str] = None,
+    ) -> Tuple[bool, str, Optional[bytes], bool]:
+        """
+        Audio faylni voice message'ga o'tkazish (OGG/Opus baytlari)
+
+        So'rov navbatga tushsa ``on_queued(position)`` chaqiriladi, navbat
+        kelganda esa ``on_queued(0)``. Oxirgi qiymat - natijani konversiya
+        keshiga yozish mumkinmi (yuklama tufayli past profil keshlanmaydi).
+        """
         try:
-            success, result, _ = await self.processor.process_audio_file(
-                bot,
-                telegram_file,
-                user_id,
-                original_filename,
-            )
+            try:
+                ticket = self.scheduler.acquire()
+            except ConversionQueueFull:
+                logger.warning(f"Konversiya navbati to'la, foydalanuvchi {user_id} rad etildi")
+                return False, "⏳ Hozir navbat to'la. Iltimos, birozdan so'ng qayta yuboring.", None, False
+
+            queued = ticket.position > 0
+            if queued and on_queued:
+                try:
+                    await self._notify_queued(on_queued, ticket.position)
+                except asyncio.CancelledError:
+                    # Hali ``async with`` ga kirilmagan - joy yoki navbatdagi o'rin bo'shatiladi
+                    ticket.cancel()
+                    raise
+
+            async with ticket:
+                if queued and on_queued:
+                    await self._notify_queued(on_queued, 0)
+
+                success, result, metadata = await self.processor.process_audio_file(
+                    bot,
+                    telegram_file,
+                    user_id,
+                    original_filename,
+                    duration,
+                    file_unique_id,
+                )
 
             if success:
-                return True, "✅ Audio muvaffaqiyatli voice message'ga aylantirildi!", result
+                cacheable = self.processor.is_full_quality(metadata['encoder_profile'], metadata['duration'])
+                return True, "✅ Audio muvaffaqiyatli voice message'ga aylantirildi!", result, cacheable
             else:
-                return False, f"❌ Xato: {result}", None
+                return False, f"❌ Xato: {result}", None, False
 
         except Exception as e:
             error_msg = f"Xizmatda xato: {str(e)}"
             logger.error(error_msg)
-            return False, error_msg, None
+            return False, error_msg, None, False
+
+    async def get_cached_voice(self, file_unique_id: str) -> Optional[str]:
+        """Avval yuborilgan voice'ning file_id'si (kesh)"""
+        try:
+            return await get_database().conversion_cache.get_voice(file_unique_id, VOICE_ENCODER_SETTINGS)
+        except Exception as e:
+            logger.warning(f"Konversiya keshini o'qishda xato: {e}")
+            return None
+
+    async def remember_voice(self, file_unique_id: str, voice_file_id: str):
+        """Yuborilgan voice'ni keshga yozish"""
+        await get_database().conversion_cache.store_voice(
+            file_unique_id, VOICE_ENCODER_SETTINGS, voice_file_id
+        )
+
+    async def forget_voice(self, file_unique_id: str):
+        """Yaroqsiz bo'lib qolgan kesh yozuvini o'chirish"""
+        try:
+            await get_database().conversion_cache.invalidate(file_unique_id, VOICE_ENCODER_SETTINGS)
+        except Exception as e:
+            logger.warning(f"Konversiya keshidan o'chirishda xato: {e}")
+
+    async def _notify_queued(self, on_queued: Callable[[int], Awaitable[Any]], position: int):
+        try:
+            await on_queued(position)
+        except Exception as e:
+            logger.warning(f"Navbat holatini yuborishda xato: {e}")
 
     async def get_audio_info(self, file_path: str) -> Dict[str, Any]:
         """Audio fayl haqida ma'lumot olish FFprobe orqali"""
@@ -273,8 +1101,6 @@ class AudioService:
             stdout, _ = await process.communicate()
 
             if process.returncode == 0:
-                import json
-
                 probe_data = json.loads(stdout.decode('utf-8'))
 
                 # Audio stream ma'lumotlarini olish
@@ -314,29 +1140,19 @@ class AudioService:
             logger.error(f"Audio ma'lumotini olishda xato: {e}")
             return {}
 
-    def validate_audio_file(
-        self,
-        telegram_file: TelegramFile,
-        filename: str = None,
-    ) -> Tuple[bool, str]:
-        """Audio faylni tekshirish"""
+    def validate_audio_file(self, telegram_file: TelegramFile) -> Tuple[bool, str]:
+        """
+        Audio faylni yuklab olishdan oldin tekshirish
+
+        Faqat hajm tekshiriladi - format kengaytma bo'yicha emas, yuklab
+        olish boshida birinchi baytlardan aniqlanadi (``sniff_audio_format``).
+        """
         try:
             # Hajmni tekshirish
             if telegram_file.file_size > config.MAX_AUDIO_SIZE:
                 max_mb = config.MAX_AUDIO_SIZE // (1024 * 1024)
                 return False, f"❌ Fayl juda katta! Maksimal hajm: {max_mb}MB"
 
-            # Formatni tekshirish
-            extension = self.processor._get_file_extension(
-                telegram_file.file_path or filename,
-            )
-            if not self.processor._is_supported_format(extension):
-                formats = ", ".join(config.SUPPORTED_AUDIO_FORMATS)
-                return False, (
-                    "❌ Format qo'llab-quvvatlanmaydi! "
-                    f"Qo'llab-quvvatlanadigan formatlar: {formats}"
-                )
-
             return True, "✅ Fayl to'g'ri"
 
         except Exception as e:
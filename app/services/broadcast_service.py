@@ -1,336 +1,675 @@
 import asyncio
 import json
+import time
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, Deque, List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
 from aiogram import Bot
 from aiogram.types import Message
-from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNetworkError,
+    TelegramServerError,
+)
 import aiofiles
 
+from app.core.config import config
 from app.core.logging import get_logger
+from app.core.metrics import BROADCAST_MESSAGES_TOTAL
+from app.services.rate_limiter import SendPacer
 from app.database.database import get_database
+from app.database.models import BroadcastStatus
+from app.utils.keyboards import AdminKeyboards
 
 logger = get_logger(__name__)
 
+# Qayta urinib ko'rish mumkin bo'lgan xatolar: flood limit va vaqtinchalik nosozliklar
+RETRYABLE_ERRORS = ("retry", "transient")
+
+# Target turi -> foydalanuvchi statusi (None - barcha foydalanuvchilar)
+TARGET_STATUSES = {
+    "all": None,
+    "active": "active",
+    "blocked": "blocked",
+}
+
+# Oluvchilar bazadan shu hajmdagi sahifalar bilan o'qiladi
+BROADCAST_PAGE_SIZE = 1000
+
+# Tarix endi ``broadcast_history`` jadvalida; eski fayl bir marta import qilinadi
+LEGACY_HISTORY_FILE = Path("data/broadcast_history.json")
+
+
+class RecipientCursor:
+    """
+    Tasdiqlangan oluvchilar watermark'i (``users.id``)
+
+    Yuboruvchilar parallel ishlaydi va tartibsiz tugaydi - ``position``
+    faqat o'zidan oldingi barcha oluvchilar tugaganda suriladi. Qayta
+    ishga tushganda shu joydan davom etiladi.
+    """
+
+    def __init__(self, position: int = 0):
+        self.position = position
+        self._pending: Deque[int] = deque()
+        self._done: Set[int] = set()
+
+    def dispatch(self, row_id: int):
+        self._pending.append(row_id)
+
+    def acknowledge(self, row_id: int):
+        self._done.add(row_id)
+        while self._pending and self._pending[0] in self._done:
+            self.position = self._pending.popleft()
+            self._done.discard(self.position)
+
+
+class BroadcastJob:
+    """Ishlayotgan broadcast vazifasi (xotiradagi holat)"""
+
+    def __init__(self, row: Dict[str, Any]):
+        self.id = row['id']
+        self.row = row
+        self.results = {
+            "total_count": row['total_count'],
+            "success_count": row['success_count'],
+            "failed_count": row['failed_count'],
+            "blocked_count": row['blocked_count'],
+            "retry_count": row['retry_count'],
+            "errors": {},
+        }
+        self.cursor = RecipientCursor(row['cursor'])
+        self.cancelled = False
+        self.started_at = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        # Jarayon xabari: oxirgi matn (o'zgarmasa tahrirlanmaydi) va tezlik o'lchovi
+        self.progress_text: Optional[str] = None
+        self.rate = 0.0
+        self._rate_sample = (self.started_at, self.processed)
+        self._running = asyncio.Event()
+        if row['status'] == BroadcastStatus.RUNNING.value:
+            self._running.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    @property
+    def processed(self) -> int:
+        return self.results['success_count'] + self.results['failed_count']
+
+    def update_rate(self) -> float:
+        """Oxirgi o'lchovdan beri yuborish tezligi (xabar/soniya)"""
+        now = time.monotonic()
+        sampled_at, sampled = self._rate_sample
+        if now - sampled_at > 0:
+            self.rate = (self.processed - sampled) / (now - sampled_at)
+        self._rate_sample = (now, self.processed)
+        return self.rate
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        # Pauza vaqti tezlikka qo'shilmasin
+        self._rate_sample = (time.monotonic(), self.processed)
+        self._running.set()
+
+    def cancel(self):
+        self.cancelled = True
+        # Pauzadagi yuboruvchilar uyg'onib, bekor qilinganini ko'rishi uchun
+        self._running.set()
+
+    async def wait_running(self):
+        await self._running.wait()
+
 
 class BroadcastService:
-    """Broadcast xabarlari xizmati"""
-    
+    """
+    Broadcast xabarlari xizmati
+
+    Har bir broadcast ``broadcast_jobs`` jadvalidagi vazifa: fonda ishlaydi,
+    cursor va hisoblagichlar davriy saqlanadi, bot qayta ishga tushganda
+    oxirgi tasdiqlangan foydalanuvchidan davom etadi.
+    """
+
     def __init__(self):
         self.db = get_database()
-        self.history_file = Path("data/broadcast_history.json")
-        self.history_file.parent.mkdir(parents=True, exist_ok=True)
-        if not self.history_file.exists():
-            self.history_file.write_text("[]", encoding="utf-8")
-    
-    def _create_empty_result(self, message: str = "Foydalanuvchilar topilmadi") -> Dict[str, Any]:
-        """Bo'sh natija yaratish"""
-        return {
-            "success": False,
-            "message": message,
-            "total_count": 0,
-            "success_count": 0,
-            "failed_count": 0,
-        }
-    
-    def _create_initial_results(self, users_count: int) -> Dict[str, Any]:
-        """Boshlang'ich natijalar yaratish"""
-        return {
-            "total_count": users_count,
-            "success_count": 0,
-            "failed_count": 0,
-            "blocked_count": 0,
-            "retry_count": 0,
-            "errors": {},
-        }
-    
+        # Barcha vazifalar uchun umumiy - parallel broadcast'lar ham Telegram limitidan oshmaydi
+        self.pacer = SendPacer(config.BROADCAST_RATE, config.BROADCAST_BURST)
+        self._jobs: Dict[int, BroadcastJob] = {}
+
+    async def start_broadcast(
+        self,
+        bot: Bot,
+        admin_id: int,
+        target_type: str = "all",
+        message_text: str = None,
+        message_object: Message = None,
+        progress_message: Message = None,
+    ) -> Optional[int]:
+        """
+        Yangi broadcast vazifasini yaratib, fonda ishga tushirish (oluvchi bo'lmasa None)
+
+        ``progress_message`` - jarayon davomida tahrirlanadigan admin xabari.
+        """
+        status = self._target_status(target_type)
+        total_count = await self.db.users.count_users(status)
+        if not total_count:
+            return None
+
+        job_id = await self.db.broadcasts.create_job({
+            "admin_id": admin_id,
+            "target_type": target_type,
+            "message_text": message_text,
+            # Media qayta ishga tushgandan keyin ham copy_message bilan yuboriladi
+            "from_chat_id": message_object.chat.id if message_object else None,
+            "message_id": message_object.message_id if message_object else None,
+            "total_count": total_count,
+            "progress_chat_id": progress_message.chat.id if progress_message else None,
+            "progress_message_id": progress_message.message_id if progress_message else None,
+        })
+        self._launch(bot, await self.db.broadcasts.get_job(job_id))
+        logger.info(f"Broadcast #{job_id} boshlandi: {total_count} foydalanuvchiga")
+        return job_id
+
+    async def resume_jobs(self, bot: Bot) -> int:
+        """Bot to'xtaganda ishlab turgan vazifalarni davom ettirish"""
+        rows = await self.db.broadcasts.get_jobs_by_status(BroadcastStatus.RUNNING)
+        for row in rows:
+            if row['id'] not in self._jobs:
+                self._launch(bot, row)
+                logger.info(f"Broadcast #{row['id']} davom ettirilmoqda (cursor: {row['cursor']})")
+        return len(rows)
+
+    async def pause_job(self, job_id: int) -> bool:
+        if not await self.db.broadcasts.set_status(job_id, BroadcastStatus.PAUSED):
+            return False
+        job = self._jobs.get(job_id)
+        if job:
+            job.pause()
+        logger.info(f"Broadcast #{job_id} pauzaga qo'yildi")
+        return True
+
+    async def resume_job(self, bot: Bot, job_id: int) -> bool:
+        if not await self.db.broadcasts.set_status(job_id, BroadcastStatus.RUNNING):
+            return False
+        job = self._jobs.get(job_id)
+        if job:
+            job.resume()
+        else:
+            self._launch(bot, await self.db.broadcasts.get_job(job_id))
+        logger.info(f"Broadcast #{job_id} davom ettirildi")
+        return True
+
+    async def cancel_job(self, bot: Bot, job_id: int) -> bool:
+        if not await self.db.broadcasts.set_status(job_id, BroadcastStatus.CANCELLED):
+            return False
+        job = self._jobs.get(job_id)
+        if job:
+            # Ishlayotgan vazifa o'zi yakunlanadi (_run_job)
+            job.cancel()
+        else:
+            # Xotirada yo'q (masalan, qayta ishga tushgandan keyin pauzada qolgan) -
+            # saqlangan hisoblagichlar bilan shu yerda yakunlanadi
+            job = BroadcastJob(await self.db.broadcasts.get_job(job_id))
+            job.cancelled = True
+            results = await self._finalize_broadcast_results(job, BroadcastStatus.CANCELLED)
+            await self._notify_admin(bot, job, results)
+        logger.info(f"Broadcast #{job_id} bekor qilindi")
+        return True
+
+    async def get_active_jobs(self) -> List[Dict[str, Any]]:
+        """Ishlayotgan va pauzadagi vazifalar (xotiradagi joriy hisoblagichlar bilan)"""
+        jobs = await self.db.broadcasts.get_active_jobs()
+        for row in jobs:
+            job = self._jobs.get(row['id'])
+            if job:
+                row.update({key: value for key, value in job.results.items() if key != "errors"})
+        return jobs
+
+    def is_progress_message(self, job_id: int, message_id: int) -> bool:
+        """Xabar ishlayotgan vazifaning jarayon xabarimi"""
+        job = self._jobs.get(job_id)
+        return bool(job and job.row['progress_message_id'] == message_id)
+
+    async def refresh_progress(self, bot: Bot, job_id: int):
+        """Jarayon xabarini darhol yangilash (pauza/davom ettirishdan keyin)"""
+        job = self._jobs.get(job_id)
+        if job:
+            await self._update_progress(bot, job)
+
+    async def shutdown(self):
+        """Vazifalarni to'xtatish; holati "running" qoladi va keyingi safar davom etadi"""
+        tasks = [job.task for job in self._jobs.values() if job.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _launch(self, bot: Bot, row: Dict[str, Any]) -> BroadcastJob:
+        job = BroadcastJob(row)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run_job(bot, job))
+        return job
+
+    def _target_status(self, target_type: str) -> Optional[str]:
+        """Target turiga mos foydalanuvchi statusi ("all" - filtrsiz)"""
+        if target_type not in TARGET_STATUSES:
+            raise ValueError(f"Noma'lum target turi: {target_type}")
+        return TARGET_STATUSES[target_type]
+
+    async def _run_job(self, bot: Bot, job: BroadcastJob) -> Dict[str, Any]:
+        """Vazifani cursor'dan oxirigacha bajarish"""
+        final_status = BroadcastStatus.COMPLETED
+        checkpoint = asyncio.create_task(self._checkpoint_loop(job))
+        progress = asyncio.create_task(self._progress_loop(bot, job))
+        try:
+            pages = self.db.users.iter_user_pages(
+                self._target_status(job.row['target_type']),
+                BROADCAST_PAGE_SIZE,
+                job.cursor.position
+            )
+            await self._process_users(bot, job, pages)
+        except asyncio.CancelledError:
+            # Bot to'xtatilmoqda - cursor saqlanadi, vazifa keyin davom etadi
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast #{job.id} xato bilan to'xtadi: {e}")
+            final_status = BroadcastStatus.FAILED
+        finally:
+            checkpoint.cancel()
+            progress.cancel()
+            await self._save_progress(job)
+            self._jobs.pop(job.id, None)
+
+        if job.cancelled:
+            final_status = BroadcastStatus.CANCELLED
+        else:
+            await self.db.broadcasts.set_status(job.id, final_status)
+        results = await self._finalize_broadcast_results(job, final_status)
+        await self._notify_admin(bot, job, results)
+        return results
+
+    async def _checkpoint_loop(self, job: BroadcastJob):
+        while True:
+            await asyncio.sleep(config.BROADCAST_CHECKPOINT_INTERVAL)
+            await self._save_progress(job)
+
+    async def _progress_loop(self, bot: Bot, job: BroadcastJob):
+        while True:
+            await self._update_progress(bot, job)
+            await asyncio.sleep(config.BROADCAST_PROGRESS_INTERVAL)
+
+    def _format_progress(self, job: BroadcastJob) -> str:
+        """Jarayon xabari: hisoblagichlar, tezlik va taxminiy qolgan vaqt"""
+        results = job.results
+        total = results['total_count']
+        processed = job.processed
+        percent = processed * 100 / total if total else 100.0
+
+        if job.cancelled:
+            state = "⛔ bekor qilinmoqda"
+        elif job.paused:
+            state = "⏸ pauzada"
+        else:
+            state = "▶️ yuborilmoqda"
+
+        rate = 0.0 if job.paused else job.update_rate()
+        remaining = max(total - processed, 0)
+        eta = f"{int(remaining / rate) // 60}:{int(remaining / rate) % 60:02d}" if rate > 0 else "—"
+
+        return (
+            f"📡 <b>Broadcast #{job.id}</b> - {state}\n\n"
+            f"🎯 Maqsad: {job.row['target_type']}\n"
+            f"📨 Jarayon: {processed}/{total} ({percent:.1f}%)\n"
+            f"✅ Yetib borgan: {results['success_count']}\n"
+            f"🚫 Xato: {results['failed_count']}\n"
+            f"⛔ Bloklaganlar: {results['blocked_count']}\n"
+            f"⚡ Tezlik: {rate:.1f} xabar/s\n"
+            f"⏳ Qolgan vaqt: {eta}"
+        )
+
+    async def _update_progress(self, bot: Bot, job: BroadcastJob):
+        """Jarayon xabarini tahrirlash (matn o'zgargan bo'lsa)"""
+        if not job.row['progress_message_id']:
+            return
+        text = self._format_progress(job)
+        if text == job.progress_text:
+            return
+        try:
+            await bot.edit_message_text(
+                text=text,
+                chat_id=job.row['progress_chat_id'],
+                message_id=job.row['progress_message_id'],
+                reply_markup=AdminKeyboards.broadcast_progress_menu(job.id, job.paused)
+            )
+            job.progress_text = text
+        except TelegramRetryAfter as e:
+            # Tahrirlash limiti - keyingi davrgacha o'tkazib yuboriladi
+            logger.debug(f"Broadcast #{job.id} jarayon xabari kechiktirildi: {e.retry_after}s")
+        except Exception as e:
+            logger.warning(f"Broadcast #{job.id} jarayon xabarini yangilashda xato: {e}")
+
+    async def _save_progress(self, job: BroadcastJob):
+        try:
+            await self.db.broadcasts.save_progress(job.id, job.cursor.position, job.results)
+        except Exception as e:
+            logger.error(f"Broadcast #{job.id} holatini saqlashda xato: {e}")
+
     async def _finalize_broadcast_results(
-        self, 
-        results: Dict[str, Any], 
-        start_time: datetime, 
-        admin_id: int, 
-        target_type: str, 
-        message_text: Optional[str]
+        self,
+        job: BroadcastJob,
+        final_status: BroadcastStatus
     ) -> Dict[str, Any]:
         """Broadcast natijalarini yakunlash"""
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        
+        results = job.results
+        duration = time.monotonic() - job.started_at
+
         logger.info(
-            f"Broadcast yakunlandi: "
+            f"Broadcast #{job.id} yakunlandi ({final_status.value}): "
             f"{results['success_count']}/{results['total_count']} muvaffaqiyatli. "
             f"Vaqt: {duration:.2f}s",
         )
-        
+
+        message_text = job.row['message_text']
         await self._log_broadcast_result(
-            admin_id=admin_id,
-            target_type=target_type,
+            job=job,
+            status=final_status,
             message_text=message_text[:100] if message_text else "Media",
-            results=results,
             duration=duration,
         )
-        
-        results["success"] = True
+
+        results["success"] = final_status == BroadcastStatus.COMPLETED
+        results["status"] = final_status.value
         results["duration"] = duration
         return results
-    
-    async def broadcast_message(
-        self,
-        bot: Bot,
-        message_text: str = None,
-        message_object: Message = None,
-        target_type: str = "all",
-        admin_id: int = None,
-    ) -> Dict[str, Any]:
-        """Broadcast xabar yuborish"""
+
+    async def _notify_admin(self, bot: Bot, job: BroadcastJob, results: Dict[str, Any]):
+        """Yakuniy natija: jarayon xabari tahrirlanadi, bo'lmasa adminga yangi xabar"""
+        if not job.row['admin_id'] and not job.row['progress_message_id']:
+            return
+        titles = {
+            BroadcastStatus.COMPLETED.value: "📡 <b>Broadcast yakunlandi</b>",
+            BroadcastStatus.CANCELLED.value: "⛔ <b>Broadcast bekor qilindi</b>",
+            BroadcastStatus.FAILED.value: "❌ <b>Broadcast xato bilan to'xtadi</b>",
+        }
+        text = (
+            f"{titles[results['status']]} (#{job.id})\n\n"
+            f"🎯 Maqsad: {job.row['target_type']}\n"
+            f"👥 Jami foydalanuvchilar: {results['total_count']}\n"
+            f"✅ Yetib borgan: {results['success_count']}\n"
+            f"🚫 Xato: {results['failed_count']}\n"
+            f"⛔ Bloklaganlar: {results['blocked_count']}\n"
+            f"⏱ Vaqt: {results['duration']:.2f}s"
+        )
+        if job.row['progress_message_id']:
+            try:
+                await bot.edit_message_text(
+                    text=text,
+                    chat_id=job.row['progress_chat_id'],
+                    message_id=job.row['progress_message_id']
+                )
+                return
+            except Exception as e:
+                logger.warning(f"Broadcast #{job.id} jarayon xabarini yakunlashda xato: {e}")
+        if not job.row['admin_id']:
+            return
         try:
-            users = await self._get_target_users(target_type)
-            if not users:
-                return self._create_empty_result()
-            
-            results = self._create_initial_results(len(users))
-            start_time = datetime.now()
-            
-            logger.info(f"Broadcast boshlandi: {results['total_count']} foydalanuvchiga")
-            
-            await self._process_batches(
-                bot=bot,
-                users=users,
-                message_text=message_text,
-                message_object=message_object,
-                results=results,
-                batch_size=30,
-            )
-            
-            return await self._finalize_broadcast_results(
-                results, start_time, admin_id, target_type, message_text
-            )
-            
+            await bot.send_message(chat_id=job.row['admin_id'], text=text)
         except Exception as e:
-            logger.error(f"Broadcast'da umumiy xato: {e}")
-            return self._create_empty_result(f"Xato: {str(e)}")
-
-    async def _send_batch_messages(
-        self, 
-        bot: Bot, 
-        batch: List[Dict[str, Any]], 
-        message_text: Optional[str], 
-        message_object: Optional[Message]
-    ) -> List[Any]:
-        """Batch xabarlarini parallel yuborish"""
-        tasks = [
-            self._send_to_user(bot, user["user_id"], message_text, message_object)
-            for user in batch
-        ]
-        return await asyncio.gather(*tasks, return_exceptions=True)
-    
-    def _update_results_from_batch(self, batch_results: List[Any], results: Dict[str, Any]) -> None:
-        """Batch natijalaridan umumiy natijalarni yangilash"""
-        for result in batch_results:
-            if isinstance(result, dict):
-                if result["success"]:
-                    results["success_count"] += 1
-                else:
-                    results["failed_count"] += 1
-                    error_type = result.get("error_type", "unknown")
-                    if error_type == "blocked":
-                        results["blocked_count"] += 1
-                    elif error_type == "retry":
-                        results["retry_count"] += 1
-            else:
-                results["failed_count"] += 1
-                logger.error(f"Batch task error: {result}")
-    
-    async def _process_batches(
+            logger.warning(f"Broadcast natijasini adminga yuborishda xato: {e}")
+
+    def _record_result(self, result: Dict[str, Any], results: Dict[str, Any]) -> None:
+        """Bitta yuborish natijasini umumiy natijalarga qo'shish"""
+        if result["success"]:
+            results["success_count"] += 1
+            BROADCAST_MESSAGES_TOTAL.inc(result="sent")
+            return
+
+        results["failed_count"] += 1
+        error_type = result.get("error_type", "unknown")
+        BROADCAST_MESSAGES_TOTAL.inc(result=error_type)
+        if error_type == "blocked":
+            results["blocked_count"] += 1
+        errors = results["errors"]
+        errors[error_type] = errors.get(error_type, 0) + 1
+
+    async def _deliver(self, bot: Bot, job: BroadcastJob, user_id: int) -> None:
+        """Bitta foydalanuvchiga yuborish, vaqtinchalik xatolarda qayta urinish bilan"""
+        attempt = 0
+        flood_waits = 0
+        while True:
+            await job.wait_running()
+            if job.cancelled:
+                return
+            await self.pacer.acquire()
+            if job.paused or job.cancelled:
+                # Token kutilayotganda pauza/bekor qilingan
+                continue
+            result = await self._send_to_user(bot, user_id, job.row)
+            error_type = result.get("error_type")
+            if error_type == "retry":
+                # Flood limit butun bot uchun - barcha yuboruvchilar kutadi;
+                # vaqtinchalik xato urinishlaridan alohida, o'z chegarasi bilan sanaladi
+                if flood_waits >= config.BROADCAST_MAX_FLOOD_WAITS:
+                    break
+                flood_waits += 1
+                job.results["retry_count"] += 1
+                self.pacer.pause(result["retry_after"])
+                continue
+            if error_type not in RETRYABLE_ERRORS or attempt >= config.BROADCAST_MAX_RETRIES:
+                break
+
+            attempt += 1
+            job.results["retry_count"] += 1
+            # Eksponensial kutish: 2, 4, 8... soniya (30 gacha)
+            await asyncio.sleep(min(2 ** attempt, 30))
+
+        self._record_result(result, job.results)
+
+    async def _process_users(
         self,
         bot: Bot,
-        users: List[Dict[str, Any]],
-        message_text: Optional[str],
-        message_object: Optional[Message],
-        results: Dict[str, Any],
-        batch_size: int,
+        job: BroadcastJob,
+        pages: AsyncIterator[List[Tuple[int, int]]],
     ) -> None:
-        """Foydalanuvchilarni batch'larga bo'lib xabar yuborish"""
-        for i in range(0, len(users), batch_size):
-            batch = users[i : i + batch_size]
-            
-            batch_results = await self._send_batch_messages(
-                bot, batch, message_text, message_object
-            )
-            
-            self._update_results_from_batch(batch_results, results)
-            
-            # Rate limiting uchun kutish
-            await asyncio.sleep(1)
-    
-    async def _get_target_users(self, target_type: str) -> List[Dict[str, Any]]:
-        """Target foydalanuvchilarni olish"""
-        try:
-            if target_type == "all":
-                return await self.db.users.get_all_users(limit=10000)  # Barcha foydalanuvchilar
-            elif target_type == "active":
-                # Faol foydalanuvchilarni olish (oxirgi 7 kun ichida faol bo'lganlar)
-                return await self._get_active_users()
-            elif target_type == "blocked":
-                # Bloklangan foydalanuvchilarni olish
-                return await self._get_blocked_users()
-            else:
-                return []
-                
-        except Exception as e:
-            logger.error(f"Target users olishda xato: {e}")
-            return []
-    
-    async def _get_active_users(self) -> List[Dict[str, Any]]:
-        """Faol foydalanuvchilarni olish"""
-        try:
-            # Bu funksiya database'da yaratilishi kerak
-            # Hozircha barcha active foydalanuvchilarni qaytaramiz
-            users = await self.db.users.get_all_users(limit=10000)
-            return [user for user in users if user['status'] == 'active']
-        except Exception as e:
-            logger.error(f"Active users olishda xato: {e}")
-            return []
-    
-    async def _get_blocked_users(self) -> List[Dict[str, Any]]:
-        """Bloklangan foydalanuvchilarni olish"""
+        """
+        Foydalanuvchilarga doimiy yuboruvchilar pool'i orqali xabar yuborish
+
+        Tezlikni umumiy token bucket belgilaydi - sekin yuborish boshqalarni
+        to'xtatmaydi, RetryAfter esa butun pool'ni to'xtatadi.
+        """
+        concurrency = max(1, config.BROADCAST_CONCURRENCY)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+        async def sender():
+            while True:
+                row_id, user_id = await queue.get()
+                try:
+                    await self._deliver(bot, job, user_id)
+                except asyncio.CancelledError:
+                    # Yuborilmagan - cursor shu foydalanuvchidan oldin qoladi
+                    raise
+                except Exception as e:
+                    logger.error(f"User {user_id} ga yuborishda kutilmagan xato: {e}")
+                    self._record_result({"success": False, "error_type": "unknown"}, job.results)
+                job.cursor.acknowledge(row_id)
+                queue.task_done()
+
+        senders = [asyncio.create_task(sender()) for _ in range(concurrency)]
         try:
-            users = await self.db.users.get_all_users(limit=10000)
-            return [user for user in users if user['status'] == 'blocked']
-        except Exception as e:
-            logger.error(f"Blocked users olishda xato: {e}")
-            return []
-    
-    async def _send_to_user(
-        self,
-        bot: Bot,
-        user_id: int,
-        message_text: str = None,
-        message_object: Message = None
-    ) -> Dict[str, Any]:
+            # Navbat chegaralangan - keyingi sahifa yuboruvchilar bo'shagandagina o'qiladi
+            async for page in pages:
+                for row_id, user_id in page:
+                    if job.cancelled:
+                        break
+                    job.cursor.dispatch(row_id)
+                    await queue.put((row_id, user_id))
+                if job.cancelled:
+                    break
+            await queue.join()
+        finally:
+            for task in senders:
+                task.cancel()
+            await asyncio.gather(*senders, return_exceptions=True)
+
+    async def _send_to_user(self, bot: Bot, user_id: int, content: Dict[str, Any]) -> Dict[str, Any]:
         """Bitta foydalanuvchiga xabar yuborish"""
         try:
-            if message_text:
+            if content.get('message_text'):
                 # Oddiy matn xabar
-                await bot.send_message(chat_id=user_id, text=message_text)
-            elif message_object:
+                await bot.send_message(chat_id=user_id, text=content['message_text'])
+            elif content.get('message_id'):
                 # Xabarni copy qilish
-                await message_object.copy_to(chat_id=user_id)
+                await bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=content['from_chat_id'],
+                    message_id=content['message_id']
+                )
             else:
                 return {"success": False, "error_type": "no_content"}
-            
+
             return {"success": True}
-            
+
         except TelegramForbiddenError:
             # Foydalanuvchi botni bloklagan
             await self.db.users.set_user_status(user_id, "blocked")
             return {"success": False, "error_type": "blocked"}
-        
+
         except TelegramRetryAfter as e:
-            # Rate limit
-            await asyncio.sleep(e.retry_after)
+            # Flood limit - kutishni chaqiruvchi (butun pool uchun) hal qiladi
             return {"success": False, "error_type": "retry", "retry_after": e.retry_after}
-        
+
+        except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as e:
+            # Tarmoq yoki Telegram tomonidagi vaqtinchalik xato
+            return {"success": False, "error_type": "transient", "error": str(e)}
+
         except TelegramBadRequest as e:
             # Noto'g'ri so'rov (user topilmagan, etc.)
             return {"success": False, "error_type": "bad_request", "error": str(e)}
-        
+
         except Exception as e:
             # Boshqa xatolar
             logger.error(f"User {user_id} ga xabar yuborishda xato: {e}")
             return {"success": False, "error_type": "unknown", "error": str(e)}
-    
+
     async def _log_broadcast_result(
         self,
-        admin_id: int,
-        target_type: str,
+        job: BroadcastJob,
+        status: BroadcastStatus,
         message_text: str,
-        results: Dict[str, Any],
         duration: float
     ):
-        """Broadcast natijasini logging qilish"""
+        """Broadcast natijasini tarixga yozish"""
+        results = job.results
         try:
-            entry = {
-                "id": datetime.now().isoformat(),
-                "admin_id": admin_id,
-                "target_type": target_type,
+            await self.db.broadcasts.add_history([{
+                "job_id": job.id,
+                "admin_id": job.row['admin_id'],
+                "target_type": job.row['target_type'],
                 "message_preview": message_text,
-                "results": results,
+                "status": status.value,
+                "total_count": results['total_count'],
+                "success_count": results['success_count'],
+                "failed_count": results['failed_count'],
+                "blocked_count": results['blocked_count'],
                 "duration": duration,
-                "timestamp": datetime.now().strftime('%d.%m.%Y %H:%M')
-            }
-
-            history = await self._read_history_async()
-            history.append(entry)
-            async with aiofiles.open(self.history_file, mode="w", encoding="utf-8") as f:
-                await f.write(json.dumps(history, ensure_ascii=False, indent=2))
+            }])
             logger.info(
-                f"Broadcast result saved: admin={admin_id}, target={target_type}, "
+                f"Broadcast result saved: admin={job.row['admin_id']}, target={job.row['target_type']}, "
                 f"total={results['total_count']}, success={results['success_count']}"
             )
-            
+
         except Exception as e:
             logger.error(f"Broadcast result logging'da xato: {e}")
-    
+
     async def get_broadcast_stats(self) -> Dict[str, Any]:
         """Broadcast statistikasini olish"""
         try:
-            history = await self._read_history_async()
-            if not history:
-                return {
-                    "total_broadcasts": 0,
-                    "total_messages_sent": 0,
-                    "success_rate": 0.0,
-                    "last_broadcast": None
-                }
-
-            total_broadcasts = len(history)
-            total_messages = sum(item["results"].get("total_count", 0) for item in history)
-            total_success = sum(item["results"].get("success_count", 0) for item in history)
-            success_rate = round((total_success / total_messages) * 100, 2) if total_messages else 0.0
+            stats = await self.db.broadcasts.get_history_stats()
+            total_messages = stats['total_messages']
+            success_rate = round((stats['total_success'] / total_messages) * 100, 2) if total_messages else 0.0
 
+            last = stats['last_broadcast']
             return {
-                "total_broadcasts": total_broadcasts,
+                "total_broadcasts": stats['total_broadcasts'],
                 "total_messages_sent": total_messages,
                 "success_rate": success_rate,
-                "last_broadcast": history[-1]
+                "last_broadcast": self._history_entry(last) if last else None
             }
         except Exception as e:
             logger.error(f"Broadcast stats olishda xato: {e}")
             return {}
-    
-    async def cancel_broadcast(self, broadcast_id: str) -> bool:
-        """Broadcast'ni to'xtatish (agar async bo'lsa)"""
+
+    def _history_entry(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Tarix qatorini statistika formatiga keltirish"""
+        created_at = datetime.fromisoformat(row['created_at'])
+        return {
+            "admin_id": row['admin_id'],
+            "target_type": row['target_type'],
+            "message_preview": row['message_preview'],
+            "results": {
+                name: row[name]
+                for name in ("total_count", "success_count", "failed_count", "blocked_count")
+            },
+            "duration": row['duration'],
+            "timestamp": created_at.strftime('%d.%m.%Y %H:%M')
+        }
+
+    async def import_legacy_history(self) -> int:
+        """
+        Eski ``data/broadcast_history.json`` tarixini bazaga ko'chirish
+
+        Fayl yozuvlar bazaga qo'shilishidan oldin ``.imported`` qo'shimchasi
+        bilan qayta nomlanadi - import xato bilan tugasa ham qayta bajarilmaydi.
+        Eski ``cancel_broadcast`` belgilari (``canceled``, natijasiz) o'tkazib yuboriladi.
+        """
+        if not LEGACY_HISTORY_FILE.exists():
+            return 0
+        imported_file = LEGACY_HISTORY_FILE.with_name(LEGACY_HISTORY_FILE.name + ".imported")
         try:
-            history = await self._read_history_async()
-            history.append({
-                "id": broadcast_id,
-                "canceled": True,
-                "timestamp": datetime.now().strftime('%d.%m.%Y %H:%M')
-            })
-            async with aiofiles.open(self.history_file, mode="w", encoding="utf-8") as f:
-                await f.write(json.dumps(history, ensure_ascii=False, indent=2))
-            logger.info(f"Broadcast {broadcast_id} to'xtatildi")
-            return True
+            async with aiofiles.open(LEGACY_HISTORY_FILE, mode="r", encoding="utf-8") as f:
+                data = await f.read()
+            history = json.loads(data) if data else []
+            LEGACY_HISTORY_FILE.rename(imported_file)
         except Exception as e:
-            logger.error(f"Broadcast cancel qilishda xato: {e}")
-            return False
+            logger.error(f"Broadcast tarixi faylini o'qishda xato: {e}")
+            return 0
 
-    def _read_history(self) -> List[Dict[str, Any]]:
         try:
-            data = self.history_file.read_text(encoding="utf-8")
-            return json.loads(data)
-        except Exception:
-            return []
+            entries = []
+            for item in history:
+                results = item.get("results")
+                if item.get("canceled") or not results:
+                    continue
+                try:
+                    created_at = datetime.fromisoformat(item["id"]).strftime('%Y-%m-%d %H:%M:%S')
+                except (KeyError, TypeError, ValueError):
+                    created_at = None
+                entries.append({
+                    "admin_id": item.get("admin_id"),
+                    "target_type": item.get("target_type"),
+                    "message_preview": item.get("message_preview"),
+                    "status": BroadcastStatus.COMPLETED.value,
+                    "total_count": results.get("total_count", 0),
+                    "success_count": results.get("success_count", 0),
+                    "failed_count": results.get("failed_count", 0),
+                    "blocked_count": results.get("blocked_count", 0),
+                    "duration": item.get("duration", 0),
+                    "created_at": created_at,
+                })
 
-    async def _read_history_async(self) -> List[Dict[str, Any]]:
-        try:
-            async with aiofiles.open(self.history_file, mode="r", encoding="utf-8") as f:
-                data = await f.read()
-                return json.loads(data) if data else []
-        except Exception:
-            return []
+            if entries:
+                await self.db.broadcasts.add_history(entries)
+            logger.info(f"Broadcast tarixi bazaga ko'chirildi: {len(entries)} ta yozuv")
+            return len(entries)
+
+        except Exception as e:
+            logger.error(f"Broadcast tarixini ko'chirishda xato ({imported_file} saqlanib qoldi): {e}")
+            return 0
 
 
 # Global service instance
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Optional, Tuple, Dict, Any
 from aiogram import Bot
 from aiogram.types import User, InlineKeyboardButton, InlineKeyboardMarkup
@@ -5,7 +6,9 @@ from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 
 from app.core.config import config
 from app.core.logging import get_logger
+from app.core.metrics import register_cache_metrics
 from app.database.database import get_database
+from app.utils.cache import TTLCache
 
 logger = get_logger(__name__)
 
@@ -17,10 +20,23 @@ class ForceSubscribeService:
     
     def __init__(self):
         self.db = get_database()
+        # (user_id, channel_id) -> obuna holati; "member" uzoq, "left" qisqa muddat saqlanadi
+        self.membership_cache = TTLCache(config.FORCE_SUB_CACHE_SIZE, config.FORCE_SUB_MEMBER_TTL)
+        register_cache_metrics('membership', self.membership_cache)
+        # Obuna bo'linmagan kanallar to'plami -> tayyor (matn, keyboard); kanallar versiyasi o'zgarsa tozalanadi
+        self._prompt_cache: Dict[Tuple[int, ...], Tuple[str, InlineKeyboardMarkup]] = {}
+        self._prompt_version = -1
     
-    async def check_user_subscriptions(self, bot: Bot, user_id: int) -> Tuple[bool, List[Dict[str, Any]]]:
+    async def check_user_subscriptions(
+        self,
+        bot: Bot,
+        user_id: int,
+        force_refresh: bool = False
+    ) -> Tuple[bool, List[Dict[str, Any]]]:
         """
         Foydalanuvchining barcha majburiy kanallarga obuna bo'lganligini tekshirish
+
+        ``force_refresh=True`` keshni chetlab o'tib, Telegram'dan qayta so'raydi.
         
         Returns:
             Tuple[is_subscribed_to_all, list_of_unsubscribed_channels]
@@ -35,15 +51,12 @@ class ForceSubscribeService:
             if not channels:
                 return True, []
             
-            unsubscribed_channels = []
-            
-            for channel in channels:
-                is_subscribed = await self._check_single_channel_subscription(
-                    bot, user_id, channel['channel_id']
-                )
-                
-                if not is_subscribed:
-                    unsubscribed_channels.append(channel)
+            # Kanallar parallel tekshiriladi, natijalar kanal tartibida qaytadi
+            results = await self._check_channels_concurrently(bot, user_id, channels, force_refresh)
+            unsubscribed_channels = [
+                channel for channel, is_subscribed in zip(channels, results)
+                if not is_subscribed
+            ]
             
             is_all_subscribed = len(unsubscribed_channels) == 0
             
@@ -56,8 +69,49 @@ class ForceSubscribeService:
             # Xato holatida foydalanuvchiga ruxsat berish
             return True, []
     
-    async def _check_single_channel_subscription(self, bot: Bot, user_id: int, channel_id: int) -> bool:
-        """Bitta kanalga obuna bo'lganligini tekshirish"""
+    async def _check_channels_concurrently(
+        self,
+        bot: Bot,
+        user_id: int,
+        channels: List[Dict[str, Any]],
+        force_refresh: bool = False
+    ) -> List[bool]:
+        """Barcha kanallarni cheklangan parallellik va timeout bilan tekshirish"""
+        semaphore = asyncio.Semaphore(max(1, config.FORCE_SUB_CHECK_CONCURRENCY))
+
+        async def check(channel: Dict[str, Any]) -> bool:
+            cache_key = (user_id, channel['channel_id'])
+            if not force_refresh:
+                cached = self.membership_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            async with semaphore:
+                try:
+                    is_subscribed = await asyncio.wait_for(
+                        self._check_single_channel_subscription(bot, user_id, channel['channel_id']),
+                        timeout=config.FORCE_SUB_CHECK_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"Kanal {channel['channel_id']} tekshiruvi vaqti tugadi")
+                    return True  # Timeout holatida ruxsat berish
+
+            if is_subscribed is None:
+                return True  # Aniqlab bo'lmadi - ruxsat beriladi, lekin keshlanmaydi
+
+            ttl = config.FORCE_SUB_MEMBER_TTL if is_subscribed else config.FORCE_SUB_LEFT_TTL
+            self.membership_cache.set(cache_key, is_subscribed, ttl=ttl)
+            return is_subscribed
+
+        return await asyncio.gather(*(check(channel) for channel in channels))
+
+    async def _check_single_channel_subscription(self, bot: Bot, user_id: int, channel_id: int) -> Optional[bool]:
+        """
+        Bitta kanalga obuna bo'lganligini tekshirish
+
+        Holatni aniqlab bo'lmasa (kanal topilmadi, bot ruxsati yo'q va h.k.)
+        None qaytaradi - bunday holatda foydalanuvchiga ruxsat beriladi.
+        """
         try:
             member = await bot.get_chat_member(chat_id=channel_id, user_id=user_id)
             
@@ -79,20 +133,45 @@ class ForceSubscribeService:
                 return False
             elif CHAT_NOT_FOUND_LITERAL in error_text:
                 logger.warning(f"Kanal {channel_id} topilmadi")
-                return True  # Kanal topilmasa, obuna shartini o'tkazish
+                return None  # Kanal topilmasa, obuna shartini o'tkazish
             else:
                 logger.error(f"Telegram API xatosi: {e}")
-                return True  # Noma'lum xatolarda ruxsat berish
+                return None  # Noma'lum xatolarda ruxsat berish
                 
         except TelegramForbiddenError:
             logger.warning(f"Bot kanal {channel_id}ga kirish huquqiga ega emas")
-            return True  # Bot ruxsati bo'lmasa, obuna shartini o'tkazish
+            return None  # Bot ruxsati bo'lmasa, obuna shartini o'tkazish
             
         except Exception as e:
             logger.error(f"Obuna tekshirishda kutilmagan xato: {e}")
-            return True  # Xato holatida ruxsat berish
+            return None  # Xato holatida ruxsat berish
     
+    def _get_subscription_prompt(self, channels: List[Dict[str, Any]]) -> Tuple[str, InlineKeyboardMarkup]:
+        """Kanallar to'plami uchun oldindan tayyorlangan xabar va keyboard"""
+        version = self.db.channels.version
+        if version != self._prompt_version:
+            self._prompt_cache.clear()
+            self._prompt_version = version
+
+        key = tuple(channel['channel_id'] for channel in channels)
+        prompt = self._prompt_cache.get(key)
+        if prompt is None:
+            prompt = (
+                self._build_subscription_message(channels),
+                self._build_subscription_keyboard(channels),
+            )
+            self._prompt_cache[key] = prompt
+        return prompt
+
     def create_subscription_keyboard(self, channels: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+        """Obuna bo'lish uchun keyboard (qayta ishlatiladi)"""
+        return self._get_subscription_prompt(channels)[1]
+
+    def get_subscription_message(self, channels: List[Dict[str, Any]]) -> str:
+        """Obuna xabari matni (qayta ishlatiladi)"""
+        return self._get_subscription_prompt(channels)[0]
+
+    def _build_subscription_keyboard(self, channels: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
         """Obuna bo'lish uchun keyboard yaratish"""
         buttons = []
 
@@ -127,7 +206,7 @@ class ForceSubscribeService:
 
         return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-    def get_subscription_message(self, channels: List[Dict[str, Any]]) -> str:
+    def _build_subscription_message(self, channels: List[Dict[str, Any]]) -> str:
         """Obuna xabari matnini yaratish"""
         if not channels:
             return "✅ Barcha majburiy kanallarga obuna bo'lgansiz!"
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """Token bucket: ``capacity`` ta token, soniyasiga ``rate`` ta to'ldiriladi"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            tokens = self.tokens + elapsed * self.rate
+            self.tokens = tokens if tokens < self.capacity else self.capacity
+            self.updated = now
+
+    def consume(self, now: float, amount: float = 1.0) -> bool:
+        """Token olishga urinish; yetarli bo'lmasa False"""
+        self._refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def delay(self, now: float, amount: float = 1.0) -> float:
+        """``amount`` token to'planishi uchun kutish kerak bo'lgan vaqt (soniya)"""
+        self._refill(now)
+        missing = amount - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+
+class SendPacer:
+    """
+    Bir nechta asinxron yuboruvchi uchun umumiy tezlik cheklovi
+
+    Barcha yuboruvchilar bitta TokenBucket'dan navbat bilan token oladi.
+    ``pause`` (masalan, Telegram RetryAfter) butun pool'ni to'xtatadi.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.bucket = TokenBucket(max(1.0, burst), rate, time.monotonic())
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Barcha yuborishlarni ``seconds`` soniyaga to'xtatish"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        # Pauza davomida token to'planmaydi - keyin burst'siz, bir tekis davom etiladi
+        self.bucket.tokens = 0.0
+        self.bucket.updated = self.paused_until
+
+    async def acquire(self):
+        """Yuborishga ruxsat kelguncha kutish"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = max(self.paused_until - now, self.bucket.delay(now))
+                if wait <= 0:
+                    self.bucket.consume(now)
+                    return
+                await asyncio.sleep(wait)
+
+
+class InMemoryRateLimiter:
+    """
+    Foydalanuvchi bo'yicha xotiradagi rate limiter
+
+    Har bir foydalanuvchi uchun bitta TokenBucket saqlanadi va joyida
+    yangilanadi - barqaror holatda tekshiruv yangi obyekt yaratmaydi.
+    To'lib qolgan (bo'sh turgan) bucket'lar davriy ravishda o'chiriladi.
+    """
+
+    def __init__(self, max_messages: int, window_seconds: int, sweep_interval: float = 60.0):
+        self.capacity = float(max(1, max_messages))
+        self.rate = self.capacity / max(1, window_seconds)
+        # Shuncha vaqt ichida bucket to'liq to'ladi - undan keyin uni saqlash shart emas
+        self.idle_after = float(max(1, window_seconds))
+        self.sweep_interval = sweep_interval
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def check(self, user_id: int) -> bool:
+        """Xabar yuborishga ruxsat bormi"""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._evict_idle(now)
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.capacity, self.rate, now)
+        return bucket.consume(now)
+
+    def _evict_idle(self, now: float):
+        """To'liq to'lgan bucket'larni o'chirish (holat yo'qolmaydi)"""
+        threshold = now - self.idle_after
+        idle = [user_id for user_id, bucket in self._buckets.items() if bucket.updated <= threshold]
+        for user_id in idle:
+            del self._buckets[user_id]
+        self._next_sweep = now + self.sweep_interval
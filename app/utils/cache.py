@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Hajmi cheklangan LRU kesh, har bir yozuv uchun yashash muddati (TTL) bilan
+
+    Hit/miss hisoblagichlari statistikaga chiqariladi.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key) is not None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Qiymatni olish (hit/miss hisoblanadi, LRU tartibi yangilanadi)"""
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Qiymatni statistika va LRU tartibiga ta'sir qilmasdan olish"""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Qiymatni saqlash; ``ttl`` berilmasa standart muddat ishlatiladi"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Yozuvni keshdan o'chirish"""
+        entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else default
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Kesh statistikasi"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+        }
@@ -0,0 +1,124 @@
+import os
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aiofiles
+
+
+class DiskLRUCache:
+    """
+    Diskdagi bayt hajmi cheklangan LRU kesh
+
+    Har bir yozuv ``<key><suffix>`` fayli. Fayl avval vaqtinchalik nom bilan
+    yoziladi va ``os.replace`` bilan joyiga qo'yiladi - o'quvchilar hech qachon
+    chala yozilgan faylni ko'rmaydi. LRU tartibi xotirada saqlanadi va ishga
+    tushganda fayllarning mtime'i bo'yicha tiklanadi.
+    """
+
+    TMP_SUFFIX = ".tmp"
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ".ogg"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max(0, max_bytes)
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def _load_index(self):
+        """Mavjud fayllardan indeksni tiklash, chala yozilganlarini o'chirish"""
+        files = []
+        for path in self.directory.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.endswith(self.TMP_SUFFIX):
+                path.unlink(missing_ok=True)
+            elif path.name.endswith(self.suffix):
+                stat = path.stat()
+                files.append((stat.st_mtime, path.name[:-len(self.suffix)], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Yozuvni o'qish (LRU tartibi yangilanadi)"""
+        if key not in self._entries:
+            self.misses += 1
+            return None
+
+        path = self._path(key)
+        try:
+            async with aiofiles.open(path, 'rb') as f:
+                data = await f.read()
+        except FileNotFoundError:
+            self._forget(key)
+            self.misses += 1
+            return None
+
+        if key not in self._entries:
+            # O'qish paytida parallel put() yozuvni chiqarib yuborgan
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        try:
+            # Qayta ishga tushirilganda ham LRU tartibi saqlanishi uchun
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    async def put(self, key: str, data: bytes):
+        """Yozuvni atomik ravishda saqlash"""
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = self.directory / f"{key}.{uuid.uuid4().hex}{self.TMP_SUFFIX}"
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                await f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        self.total_bytes += len(data) - self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+        self._evict()
+
+    def _forget(self, key: str):
+        self.total_bytes -= self._entries.pop(key, 0)
+
+    def _evict(self):
+        """Byudjetdan oshganda eng eski yozuvlarni o'chirish"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Kesh statistikasi"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+        }
@@ -1,3 +1,5 @@
+from typing import Any, Dict, List
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 
 
@@ -47,6 +49,9 @@ class AdminKeyboards:
                 InlineKeyboardButton(text="📅 Bugun", callback_data="stats_today"),
                 InlineKeyboardButton(text="📆 Bu hafta", callback_data="stats_week")
             ],
+            [
+                InlineKeyboardButton(text="⚡ Kesh", callback_data="stats_cache")
+            ],
             [
                 InlineKeyboardButton(text="🔄 Yangilash", callback_data="stats_refresh"),
                 InlineKeyboardButton(text=BACK_TEXT, callback_data="admin_back")
@@ -118,6 +123,37 @@ class AdminKeyboards:
         ]
         return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+    @staticmethod
+    def broadcast_jobs_menu(jobs: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+        """Faol broadcast vazifalarini boshqarish menyusi"""
+        buttons = []
+        for job in jobs:
+            if job['status'] == 'paused':
+                toggle = InlineKeyboardButton(text=f"▶️ #{job['id']}", callback_data=f"broadcast_resume_{job['id']}")
+            else:
+                toggle = InlineKeyboardButton(text=f"⏸ #{job['id']}", callback_data=f"broadcast_pause_{job['id']}")
+            buttons.append([
+                toggle,
+                InlineKeyboardButton(text=f"⛔ #{job['id']}", callback_data=f"broadcast_cancel_{job['id']}")
+            ])
+        buttons.append([
+            InlineKeyboardButton(text="🔄 Yangilash", callback_data="broadcast_status"),
+            InlineKeyboardButton(text=BACK_TEXT, callback_data="admin_broadcast")
+        ])
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    @staticmethod
+    def broadcast_progress_menu(job_id: int, paused: bool = False) -> InlineKeyboardMarkup:
+        """Broadcast jarayon xabari tugmalari"""
+        if paused:
+            toggle = InlineKeyboardButton(text="▶️ Davom ettirish", callback_data=f"broadcast_resume_{job_id}")
+        else:
+            toggle = InlineKeyboardButton(text="⏸ Pauza", callback_data=f"broadcast_pause_{job_id}")
+        buttons = [
+            [toggle, InlineKeyboardButton(text="⛔ Bekor qilish", callback_data=f"broadcast_cancel_{job_id}")]
+        ]
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
     @staticmethod
     def broadcast_group_menu() -> InlineKeyboardMarkup:
         """Broadcast guruh tanlash menyusi"""
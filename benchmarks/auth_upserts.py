@@ -0,0 +1,89 @@
+"""
+AuthMiddleware yozuvlari benchmark'i
+
+Sintetik update oqimini (ko'p xabar, kam profil o'zgarishi) AuthMiddleware
+orqali o'tkazib, har bir xabarga to'g'ri keladigan bazaga yozuvlar sonini
+o'lchaydi. Soat simulyatsiya qilinadi, shuning uchun bir necha daqiqalik
+trafik bir zumda o'tadi.
+
+Ishga tushirish:
+    python benchmarks/auth_upserts.py --events 20000 --users 300 --minutes 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.utils.cache as cache_module  # noqa: E402
+from app.database.database import init_database, close_database  # noqa: E402
+
+
+class SimulatedClock:
+    """time.monotonic o'rniga ishlatiladigan soat"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+async def _handler(event, data):
+    return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AuthMiddleware upsert benchmark")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--minutes", type=float, default=10.0, help="simulyatsiya qilinadigan vaqt")
+    parser.add_argument("--granularity", type=float, default=60.0)
+    parser.add_argument("--profile-change-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    clock = SimulatedClock()
+    cache_module.time = clock
+    rng = random.Random(42)
+    profiles = {
+        user_id: SimpleNamespace(
+            id=user_id,
+            username=f"user{user_id}",
+            first_name="Test",
+            last_name=None,
+            language_code="uz",
+        )
+        for user_id in range(1, args.users + 1)
+    }
+    step = args.minutes * 60 / args.events
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await init_database(os.path.join(tmp, "bench.db"))
+        # Middleware paketi servislarni import qiladi, ular esa tayyor bazani kutadi
+        from app.middlewares.auth import AuthMiddleware
+
+        middleware = AuthMiddleware(activity_granularity=args.granularity)
+        try:
+            for _ in range(args.events):
+                clock.now += step
+                user = profiles[rng.randint(1, args.users)]
+                if rng.random() < args.profile_change_rate:
+                    user.first_name = f"Test{rng.randint(0, 999)}"
+                await middleware(_handler, SimpleNamespace(from_user=user), {})
+        finally:
+            await close_database()
+
+    print(f"Xabarlar: {middleware.events_seen}, foydalanuvchilar: {args.users}, vaqt: {args.minutes} daqiqa")
+    print("Oldin:  2.00 yozuv/xabar (create_user + update_user_activity)")
+    print(
+        f"Hozir:  {middleware.activity_writes / middleware.events_seen:.3f} yozuv/xabar "
+        f"({middleware.activity_writes} upsert)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
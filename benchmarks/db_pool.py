@@ -0,0 +1,107 @@
+"""
+Ma'lumotlar bazasi ulanish pool'i benchmark'i
+
+Har bir so'rovda yangi ``aiosqlite.connect`` ochish (eski usul) bilan
+DatabaseManager pool'ini parallel update'lar ostida solishtiradi.
+
+Ishga tushirish:
+    python benchmarks/db_pool.py --updates 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.database import Database  # noqa: E402
+
+
+def _user_data(user_id: int) -> dict:
+    return {
+        'user_id': user_id,
+        'username': f"user{user_id}",
+        'first_name': "Test",
+        'last_name': None,
+        'language_code': 'uz',
+    }
+
+
+async def _legacy_update(db_path: str, user_id: int):
+    """Eski usul: har bir so'rov uchun alohida ulanish"""
+    data = _user_data(user_id)
+    async with aiosqlite.connect(db_path) as conn:
+        await conn.execute(
+            'INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, language_code) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (data['user_id'], data['username'], data['first_name'], data['last_name'], data['language_code'])
+        )
+        await conn.commit()
+    async with aiosqlite.connect(db_path) as conn:
+        await conn.execute(
+            'UPDATE users SET last_activity = CURRENT_TIMESTAMP WHERE user_id = ?', (user_id,)
+        )
+        await conn.commit()
+    async with aiosqlite.connect(db_path) as conn:
+        conn.row_factory = aiosqlite.Row
+        cursor = await conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+        await cursor.fetchone()
+    return 3
+
+
+async def _pooled_update(db: Database, user_id: int):
+    """Pool orqali: AuthMiddleware bilan bir xil so'rovlar"""
+    await db.users.create_user(_user_data(user_id))
+    await db.users.update_user_activity(user_id)
+    await db.users.get_user(user_id)
+    return 3
+
+
+async def _run(name: str, worker, updates: int, concurrency: int, users: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            return await worker(i % users + 1)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(updates)))
+    elapsed = time.perf_counter() - started
+    queries = sum(results)
+    print(
+        f"{name:<10} {updates} update, {queries} so'rov: {elapsed:.2f}s "
+        f"({queries / elapsed:.0f} so'rov/s, {updates / elapsed:.0f} update/s)"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="DB pool benchmark")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db = Database(db_path, args.pool_size)
+        await db.init()
+        try:
+            await _run(
+                "connect", lambda uid: _legacy_update(db_path, uid),
+                args.updates, args.concurrency, args.users,
+            )
+            await _run(
+                "pool", lambda uid: _pooled_update(db, uid),
+                args.updates, args.concurrency, args.users,
+            )
+        finally:
+            await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
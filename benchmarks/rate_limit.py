@@ -0,0 +1,77 @@
+"""
+Rate limiter microbenchmark'i
+
+Xotiradagi token bucket (InMemoryRateLimiter) va SQLite rate_limits jadvali
+(RateLimitRepository.check_rate_limit) tekshiruvlarini solishtiradi.
+
+Ishga tushirish:
+    python benchmarks/rate_limit.py --checks 20000 --users 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.database import Database  # noqa: E402
+from app.services.rate_limiter import InMemoryRateLimiter  # noqa: E402
+
+
+def bench_memory(checks: int, users: int, max_messages: int, window: int):
+    limiter = InMemoryRateLimiter(max_messages, window)
+    # Isitish: har bir foydalanuvchi uchun bucket yaratiladi
+    for user_id in range(users):
+        limiter.check(user_id)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    for i in range(checks):
+        limiter.check(i % users)
+    elapsed = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename')
+                   if 'rate_limiter' in str(stat.traceback))
+    print(
+        f"memory  {checks} tekshiruv: {elapsed * 1000:.1f}ms "
+        f"({elapsed / checks * 1e6:.2f}us/tekshiruv), saqlanib qolgan xotira: {retained} bayt"
+    )
+
+
+async def bench_sqlite(checks: int, users: int, max_messages: int, window: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        await db.init()
+        try:
+            started = time.perf_counter()
+            for i in range(checks):
+                await db.rate_limits.check_rate_limit(i % users, max_messages, window)
+            elapsed = time.perf_counter() - started
+        finally:
+            await db.close()
+    print(
+        f"sqlite  {checks} tekshiruv: {elapsed * 1000:.1f}ms "
+        f"({elapsed / checks * 1e6:.2f}us/tekshiruv)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter microbenchmark")
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--max-messages", type=int, default=10)
+    parser.add_argument("--window", type=int, default=60)
+    args = parser.parse_args()
+
+    bench_memory(args.checks, args.users, args.max_messages, args.window)
+    asyncio.run(bench_sqlite(args.checks, args.users, args.max_messages, args.window))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,7 @@ from app.core.bot import (
     setup_webhook,
     close_bot_resources
 )
-from app.database.database import init_database
+from app.database.database import init_database, close_database
 
 logger = get_logger(__name__)
 
@@ -31,7 +31,16 @@ async def setup_application():
         config.create_directories()
         
         # Ma'lumotlar bazasini sozlash
-        await init_database(config.DATABASE_URL)
+        await init_database(
+            config.DATABASE_URL,
+            pool_size=config.DATABASE_POOL_SIZE,
+            pragmas=config.database_pragmas(),
+            flush_interval=config.WRITE_BEHIND_INTERVAL,
+            flush_max_rows=config.WRITE_BEHIND_MAX_ROWS,
+            user_cache_size=config.USER_CACHE_SIZE,
+            user_cache_ttl=config.USER_CACHE_TTL,
+            conversion_cache_size=config.CONVERSION_CACHE_SIZE
+        )
         logger.info("Ma'lumotlar bazasi sozlandi")
         
         # Bot va dispatcher yaratish
@@ -52,6 +61,11 @@ async def setup_application():
         # Webhook sozlash (agar kerak bo'lsa)
         await setup_webhook(bot)
         
+        # Eski broadcast tarixini ko'chirish va to'xtab qolgan vazifalarni davom ettirish
+        from app.services.broadcast_service import broadcast_service
+        await broadcast_service.import_legacy_history()
+        await broadcast_service.resume_jobs(bot)
+        
         return bot, dp
         
     except Exception as e:
@@ -67,6 +81,16 @@ async def main():
     try:
         bot, dp = await setup_application()
         
+        # Prometheus metrikalari - faqat METRICS_HOST'dagi alohida serverda
+        # (ochiq webhook serverida emas), METRICS_PORT berilganda
+        if config.METRICS_PORT and config.METRICS_PATH:
+            from app.core.metrics import start_metrics_server
+            metrics_runner = await start_metrics_server(
+                config.METRICS_HOST,
+                config.METRICS_PORT,
+                config.METRICS_PATH
+            )
+        
         if config.WEBHOOK_ENABLED:
             # Webhook rejimi
             from aiohttp import web
@@ -113,8 +137,13 @@ async def main():
         raise
         
     finally:
+        if 'metrics_runner' in locals():
+            await metrics_runner.cleanup()
         if 'bot' in locals() and 'dp' in locals():
+            from app.services.broadcast_service import broadcast_service
+            await broadcast_service.shutdown()
             await close_bot_resources(bot, dp)
+        await close_database()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Loyiha ildizini import yo'liga qo'shish (``pytest`` to'g'ridan-to'g'ri chaqirilganda ham)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
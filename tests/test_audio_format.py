@@ -0,0 +1,37 @@
+import pytest
+
+from app.services.audio_service import SNIFF_BYTES, sniff_audio_format
+
+# Haqiqiy fayllarning boshlanishi (SNIFF_BYTES baytgacha)
+HEADERS = {
+    "id3_tagged_mp3": (b"ID3\x04\x00\x00\x00\x00\x01\x76TI", "mp3"),
+    "mpeg1_layer3_frame": (b"\xff\xfb\x90\x64\x00\x0f\xf0\x00\x00\x69\x00\x00", "mp3"),
+    "mpeg2_layer3_frame": (b"\xff\xf3\x84\xc4\x00\x00\x00\x03\x48\x00\x00\x00", "mp3"),
+    "adts_aac": (b"\xff\xf1\x50\x80\x02\x1f\xfc\x21\x00\x49\x90\x02", "aac"),
+    "ogg_page": (b"OggS\x00\x02\x00\x00\x00\x00\x00\x00", "ogg"),
+    "flac": (b"fLaC\x00\x00\x00\x22\x10\x00\x10\x00", "flac"),
+    "webm_ebml": (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\xf7\x81", "webm"),
+    "riff_wave": (b"RIFF\x24\x08\x00\x00WAVE", "wav"),
+    "m4a_ftyp": (b"\x00\x00\x00\x20ftypM4A ", "m4a"),
+    "mp4_ftyp": (b"\x00\x00\x00\x18ftypmp42", "m4a"),
+}
+
+
+@pytest.mark.parametrize("head, expected", HEADERS.values(), ids=HEADERS.keys())
+def test_sniffs_known_audio_headers(head, expected):
+    assert len(head) == SNIFF_BYTES
+    assert sniff_audio_format(head) == expected
+
+
+@pytest.mark.parametrize("head", [
+    b"",
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d",
+    b"%PDF-1.7\n%\xe2\xe3",
+    b"PK\x03\x04\x14\x00\x00\x00\x08\x00",
+    b"RIFF\x24\x08\x00\x00AVI ",
+    b"\xff\xd8\xff\xe0\x00\x10JFIF\x00",
+    b"plain text!!",
+])
+def test_rejects_non_audio(head):
+    assert sniff_audio_format(head) is None
+
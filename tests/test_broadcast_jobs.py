@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from app.core.config import config
+from app.database.database import close_database, get_database, init_database
+from app.database.models import BroadcastStatus
+
+USER_IDS = list(range(1001, 1061))
+
+
+class FakeBot:
+    """Yuborilgan xabarlarni yozib boradi; ``hang_after`` dan keyin javob bermay qoladi"""
+
+    def __init__(self, hang_after=None):
+        self.sent = []
+        self.hang_after = hang_after
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0)
+        if self.hang_after is not None and len(self.sent) >= self.hang_after:
+            # Bot to'xtatilguncha osilib qoladi (yuborilmagan hisoblanadi)
+            await asyncio.Event().wait()
+        self.sent.append(chat_id)
+
+
+@pytest_asyncio.fixture
+async def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'BROADCAST_RATE', 10000)
+    monkeypatch.setattr(config, 'BROADCAST_BURST', 100)
+    monkeypatch.setattr(config, 'BROADCAST_CONCURRENCY', 5)
+    monkeypatch.setattr(config, 'BROADCAST_CHECKPOINT_INTERVAL', 0.01)
+    monkeypatch.setattr(config, 'BROADCAST_PROGRESS_INTERVAL', 60)
+    await init_database(str(tmp_path / 'bot.db'))
+    for user_id in USER_IDS:
+        await get_database().users.create_user({'user_id': user_id, 'first_name': 'Test'})
+    await get_database().writes.flush()
+
+    # Global instance bazaga import paytida ulanadi - shuning uchun kech import
+    from app.services.broadcast_service import BroadcastService
+    yield BroadcastService
+    await close_database()
+
+
+async def _wait_jobs(broadcasts):
+    tasks = [job.task for job in broadcasts._jobs.values()]
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=10)
+
+
+@pytest.mark.asyncio
+async def test_cursor_advances_only_over_contiguous_acks(service):
+    from app.services.broadcast_service import RecipientCursor
+
+    cursor = RecipientCursor(position=10)
+    for row_id in (11, 12, 13, 14):
+        cursor.dispatch(row_id)
+
+    cursor.acknowledge(13)
+    cursor.acknowledge(12)
+    assert cursor.position == 10
+
+    cursor.acknowledge(11)
+    assert cursor.position == 13
+
+    cursor.acknowledge(14)
+    assert cursor.position == 14
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_every_user_once(service):
+    broadcasts = service()
+    bot = FakeBot()
+
+    job_id = await broadcasts.start_broadcast(bot, admin_id=None, target_type='all', message_text='hi')
+    await _wait_jobs(broadcasts)
+
+    assert sorted(bot.sent) == USER_IDS
+    row = await get_database().broadcasts.get_job(job_id)
+    assert row['status'] == BroadcastStatus.COMPLETED.value
+    assert row['success_count'] == len(USER_IDS)
+
+
+@pytest.mark.asyncio
+async def test_resumed_job_continues_without_duplicates(service):
+    broadcasts = service()
+    first_bot = FakeBot(hang_after=23)
+
+    job_id = await broadcasts.start_broadcast(first_bot, admin_id=None, target_type='all', message_text='hi')
+    while len(first_bot.sent) < 23:
+        await asyncio.sleep(0.01)
+    # Bot to'xtatiladi: osilib qolgan yuborishlar bekor qilinadi, holat "running" qoladi
+    await broadcasts.shutdown()
+
+    row = await get_database().broadcasts.get_job(job_id)
+    assert row['status'] == BroadcastStatus.RUNNING.value
+    assert row['success_count'] == 23
+
+    # Qayta ishga tushish - yangi xizmat saqlangan cursor'dan davom etadi
+    restarted = service()
+    second_bot = FakeBot()
+    assert await restarted.resume_jobs(second_bot) == 1
+    await _wait_jobs(restarted)
+
+    sent = first_bot.sent + second_bot.sent
+    assert sorted(sent) == USER_IDS
+    row = await get_database().broadcasts.get_job(job_id)
+    assert row['status'] == BroadcastStatus.COMPLETED.value
+    assert row['success_count'] == len(USER_IDS)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_cannot_be_resumed(service):
+    broadcasts = service()
+    bot = FakeBot(hang_after=5)
+
+    job_id = await broadcasts.start_broadcast(bot, admin_id=None, target_type='all', message_text='hi')
+    while len(bot.sent) < 5:
+        await asyncio.sleep(0.01)
+
+    assert await broadcasts.cancel_job(bot, job_id)
+    await broadcasts.shutdown()
+
+    assert not await broadcasts.resume_job(bot, job_id)
+    assert not await broadcasts.cancel_job(bot, job_id)
+    row = await get_database().broadcasts.get_job(job_id)
+    assert row['status'] == BroadcastStatus.CANCELLED.value
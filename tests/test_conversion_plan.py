@@ -0,0 +1,57 @@
+import pytest
+
+from app.core.config import config
+from app.services.audio_service import ENCODER_PROFILES, plan_conversion
+
+
+def _arg(plan, flag):
+    args = plan['args']
+    return args[args.index(flag) + 1]
+
+
+def test_mono_opus_is_copied():
+    plan = plan_conversion({'codec': 'opus', 'channels': 1}, 'speech')
+
+    assert plan['mode'] == 'copy'
+    assert plan['profile'] == 'copy'
+    assert plan['args'] == ['-c:a', 'copy']
+
+
+def test_stereo_opus_is_downmixed_at_fastest_setting(monkeypatch):
+    monkeypatch.setattr(config, 'AUDIO_OPUS_STEREO_COPY', False)
+
+    plan = plan_conversion({'codec': 'opus', 'channels': 2}, 'speech')
+
+    assert plan['mode'] == 'downmix'
+    assert plan['profile'] == 'speech'
+    assert _arg(plan, '-ac') == '1'
+    assert _arg(plan, '-b:a') == str(ENCODER_PROFILES['speech']['bitrate'])
+    assert _arg(plan, '-compression_level') == '0'
+
+
+def test_stereo_opus_is_copied_when_allowed(monkeypatch):
+    monkeypatch.setattr(config, 'AUDIO_OPUS_STEREO_COPY', True)
+
+    plan = plan_conversion({'codec': 'opus', 'channels': 2})
+
+    assert plan['mode'] == 'copy'
+
+
+@pytest.mark.parametrize('probe', [
+    None,
+    {},
+    {'codec': 'mp3', 'channels': 2},
+    {'codec': 'aac', 'channels': 1},
+    {'codec': 'vorbis', 'channels': 1},
+    # Ko'p kanalli Opus copy/downmix qilinmaydi
+    {'codec': 'opus', 'channels': 6},
+])
+@pytest.mark.parametrize('profile', list(ENCODER_PROFILES))
+def test_other_inputs_are_transcoded(probe, profile):
+    plan = plan_conversion(probe, profile)
+
+    assert plan['mode'] == 'transcode'
+    assert plan['profile'] == profile
+    assert _arg(plan, '-ac') == '1'
+    assert _arg(plan, '-b:a') == str(ENCODER_PROFILES[profile]['bitrate'])
+    assert _arg(plan, '-application') == ENCODER_PROFILES[profile]['application']
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.services.audio_service import ConversionQueueFull, ConversionScheduler
+
+
+@pytest.mark.asyncio
+async def test_free_worker_is_granted_immediately():
+    scheduler = ConversionScheduler(workers=2, queue_size=5)
+
+    ticket = scheduler.acquire()
+
+    assert ticket.position == 0
+    assert scheduler.active == 1
+    assert scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_release_hands_slot_to_first_waiter():
+    scheduler = ConversionScheduler(workers=1, queue_size=5)
+    first = scheduler.acquire()
+    second = scheduler.acquire()
+    third = scheduler.acquire()
+
+    assert (second.position, third.position) == (1, 2)
+
+    first.release()
+    async with second:
+        assert scheduler.active == 1
+        assert third.position == 1
+    # Ikkinchi chiqqanda joy uchinchiga o'tadi
+    assert third.position == 0
+    assert scheduler.active == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_new_requests():
+    scheduler = ConversionScheduler(workers=1, queue_size=1)
+    scheduler.acquire()
+    scheduler.acquire()
+
+    with pytest.raises(ConversionQueueFull):
+        scheduler.acquire()
+    assert scheduler.try_acquire() is None
+
+
+@pytest.mark.asyncio
+async def test_release_is_idempotent():
+    scheduler = ConversionScheduler(workers=2, queue_size=5)
+    ticket = scheduler.acquire()
+
+    ticket.release()
+    ticket.release()
+
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_ticket_leaves_queue():
+    scheduler = ConversionScheduler(workers=1, queue_size=5)
+    running = scheduler.acquire()
+    queued = scheduler.acquire()
+
+    queued.cancel()
+
+    assert scheduler.queued == 0
+    running.release()
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_unused_granted_ticket_frees_slot():
+    scheduler = ConversionScheduler(workers=1, queue_size=5)
+    immediate = scheduler.acquire()
+    immediate.cancel()
+    assert scheduler.active == 0
+
+    running = scheduler.acquire()
+    waiter = scheduler.acquire()
+    running.release()
+    # Joy berilgan, lekin ``async with`` ga kirilmagan
+    waiter.cancel()
+    waiter.cancel()
+
+    assert scheduler.active == 0
+    assert scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    scheduler = ConversionScheduler(workers=1, queue_size=5)
+    running = scheduler.acquire()
+    queued = scheduler.acquire()
+
+    async def use(ticket):
+        async with ticket:
+            pass
+
+    task = asyncio.create_task(use(queued))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert scheduler.queued == 0
+    running.release()
+    assert scheduler.active == 0
+    assert scheduler.acquire().position == 0
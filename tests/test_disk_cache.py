@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from app.utils import disk_cache
+from app.utils.disk_cache import DiskLRUCache
+
+
+@pytest.mark.asyncio
+async def test_put_and_get_roundtrip(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+
+    await cache.put("a", b"hello")
+
+    assert await cache.get("a") == b"hello"
+    assert await cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    await cache.put("a", b"aaaa")
+    await cache.put("b", b"bbbb")
+    # "a" ishlatildi - endi eng eskisi "b"
+    await cache.get("a")
+
+    await cache.put("c", b"cccc")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"aaaa"
+    assert await cache.get("c") == b"cccc"
+    assert cache.total_bytes == 8
+    assert not (tmp_path / "b.ogg").exists()
+
+
+@pytest.mark.asyncio
+async def test_oversized_entry_is_not_stored(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=4)
+
+    await cache.put("a", b"too large")
+
+    assert len(cache) == 0
+    assert cache.total_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_index_is_restored_and_temp_files_removed(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+    await cache.put("a", b"data")
+    (tmp_path / "b.1234.tmp").write_bytes(b"partial")
+
+    reopened = DiskLRUCache(str(tmp_path), max_bytes=100)
+
+    assert await reopened.get("a") == b"data"
+    assert not (tmp_path / "b.1234.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_missing_file_is_a_miss(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+    await cache.put("a", b"data")
+    os.remove(tmp_path / "a.ogg")
+
+    assert await cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.total_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_entry_evicted_during_read_is_a_miss(tmp_path, monkeypatch):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=8)
+    await cache.put("a", b"aaaa")
+    real_open = disk_cache.aiofiles.open
+
+    class EvictingReader:
+        """O'qish paytida parallel put() "a" ni chiqarib yuboradi"""
+
+        def __init__(self, path, mode):
+            self._context = real_open(path, mode)
+
+        async def __aenter__(self):
+            self._file = await self._context.__aenter__()
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return await self._context.__aexit__(*exc_info)
+
+        async def read(self):
+            data = await self._file.read()
+            monkeypatch.setattr(disk_cache.aiofiles, "open", real_open)
+            await cache.put("b", b"bbbbbbbb")
+            return data
+
+    monkeypatch.setattr(disk_cache.aiofiles, "open", EvictingReader)
+
+    assert await cache.get("a") is None
+    assert cache.misses == 1
+    assert list(cache._entries) == ["b"]